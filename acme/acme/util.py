@@ -6,4 +6,4 @@ from typing import Any
 
 def map_keys(dikt: Mapping[Any, Any], func: Callable[[Any], Any]) -> dict[Any, Any]:
     """Map dictionary keys."""
-    return {func(key): value for key, value in dikt.items()}
+    return dict(zip(map(func, dikt), dikt.values()))
@@ -154,7 +154,7 @@ class ACMEServer:
         """Configure and launch an HTTP proxy"""
         print(f'=> Configuring the HTTP proxy on port {self._http_01_port}...')
         http_port_map = cast(dict[str, int], self.acme_xdist['http_port'])
-        mapping = {r'.+\.{0}\.wtf'.format(node): 'http://127.0.0.1:{0}'.format(port)
+        mapping = {rf'.+\.{node}\.wtf': f'http://127.0.0.1:{port}'
                    for node, port in http_port_map.items()}
         command = [sys.executable, proxy.__file__, str(self._http_01_port), json.dumps(mapping)]
         self._launch_process(command)
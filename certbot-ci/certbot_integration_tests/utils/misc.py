@@ -75,6 +75,14 @@ class GracefulTCPServer(socketserver.TCPServer):
     allow_reuse_address = True
 
 
+class GracefulThreadingTCPServer(socketserver.ThreadingMixIn, GracefulTCPServer):
+    """
+    This subclass of GracefulTCPServer handles each request in a separate thread,
+    so that a slow request does not block the other ones.
+    """
+    daemon_threads = True
+
+
 @contextlib.contextmanager
 def create_http_server(port: int) -> Generator[str, None, None]:
     """
@@ -2,31 +2,72 @@
 # pylint: disable=missing-module-docstring
 
 from collections.abc import Mapping
+import functools
 import http.server as BaseHTTPServer
 import json
 import re
 import sys
 
-import requests
+import urllib3
 
-from certbot_integration_tests.utils.misc import GracefulTCPServer
+from certbot_integration_tests.utils.misc import GracefulThreadingTCPServer
+
+# Hop-by-hop headers only apply to a single connection and must not be forwarded.
+_HOP_BY_HOP_HEADERS = frozenset(('connection', 'keep-alive', 'transfer-encoding'))
+_CHUNK_SIZE = 65536
+_POOL_MAXSIZE = 10
+# Like requests did before, up to 30 redirects are followed but failed calls are
+# not retried. The "other" counter is left out as urllib3 1.24 does not know it.
+_RETRIES = urllib3.Retry(total=30, connect=0, read=0, status=0)
 
 
 def _create_proxy(mapping: Mapping[str, str]) -> type[BaseHTTPServer.BaseHTTPRequestHandler]:
     # pylint: disable=missing-function-docstring
+    # A single pool manager lets connections to the backends be kept alive between requests.
+    # Since requests are handled in parallel threads, block caps the number of
+    # outstanding calls to each backend to the pool size instead of opening extra
+    # connections that would be discarded afterwards.
+    pool = urllib3.PoolManager(num_pools=max(len(mapping), 1), maxsize=_POOL_MAXSIZE,
+                               block=True, retries=_RETRIES)
+
+    # All host patterns are tried in a single pass of the regex engine, the name
+    # of the matching group identifying the backend.
+    combined = re.compile('|'.join(f'(?P<g{index}>{pattern})'
+                                   for index, pattern in enumerate(mapping)))
+    group_to_backend = {f'g{index}': backend for index, backend in enumerate(mapping.values())}
+
+    @functools.lru_cache(maxsize=1024)
+    def find_backend(host: str) -> str:
+        match = combined.match(host)
+        if not match or match.lastgroup not in group_to_backend:
+            raise KeyError(host)
+        return group_to_backend[match.lastgroup]
+
     class ProxyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
         # pylint: disable=missing-class-docstring
-        def do_GET(self) -> None:
-            headers = {key.lower(): value for key, value in self.headers.items()}
-            backend = [backend for pattern, backend in mapping.items()
-                       if re.match(pattern, headers['host'])][0]
-            response = requests.get(backend + self.path, headers=headers, timeout=10)
-
-            self.send_response(response.status_code)
-            for key, value in response.headers.items():
-                self.send_header(key, value)
-            self.end_headers()
-            self.wfile.write(response.content)
+        def _forward(self) -> None:
+            # self.headers lookups are already case-insensitive.
+            backend = find_backend(self.headers.get('Host', ''))
+            headers = {key: value for key, value in self.headers.items()
+                       if key.lower() not in _HOP_BY_HOP_HEADERS}
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0)) or None
+            # The body is forwarded as received, so Content-Length and
+            # Content-Encoding sent by the backend remain valid.
+            response = pool.request(self.command, backend + self.path, body=body,
+                                    headers=headers, timeout=10.0,
+                                    preload_content=False, decode_content=False)
+            try:
+                self.send_response(response.status)
+                for key, value in response.headers.items():
+                    if key.lower() not in _HOP_BY_HOP_HEADERS:
+                        self.send_header(key, value)
+                self.end_headers()
+                for chunk in response.stream(_CHUNK_SIZE):
+                    self.wfile.write(chunk)
+            finally:
+                response.release_conn()
+
+        do_GET = do_HEAD = do_POST = do_PUT = do_DELETE = do_OPTIONS = _forward
 
     return ProxyHandler
 
@@ -34,7 +75,7 @@ def _create_proxy(mapping: Mapping[str, str]) -> type[BaseHTTPServer.BaseHTTPReq
 if __name__ == '__main__':
     http_port = int(sys.argv[1])
     port_mapping = json.loads(sys.argv[2])
-    httpd = GracefulTCPServer(('', http_port), _create_proxy(port_mapping))
+    httpd = GracefulThreadingTCPServer(('', http_port), _create_proxy(port_mapping))
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
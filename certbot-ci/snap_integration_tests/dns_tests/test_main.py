@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 """Module executing integration tests against certbot snap."""
 from collections.abc import Generator
-import glob
 import os
 import re
 import subprocess
 
 import pytest
 
+_DNS_SNAP_RE = re.compile(r'^certbot-(dns-\w+)_.*\.snap$')
+
 
 @pytest.fixture(autouse=True, scope="module")
 def install_certbot_snap(request: pytest.FixtureRequest) -> Generator[None, None, None]:
@@ -17,35 +18,50 @@ def install_certbot_snap(request: pytest.FixtureRequest) -> Generator[None, None
     try:
         snap_folder = request.config.getoption("snap_folder")
         snap_arch = request.config.getoption("snap_arch")
-        snap_path = glob.glob(os.path.join(snap_folder, 'certbot_*_{0}.snap'.format(snap_arch)))[0]
+        suffix = f'_{snap_arch}.snap'
+        with os.scandir(snap_folder) as entries:
+            snap_path = next((entry.path for entry in entries
+                              if entry.name.startswith('certbot_') and entry.name.endswith(suffix)),
+                             None)
+        assert snap_path, 'no certbot snap found'
         subprocess.check_call(['snap', 'install', '--classic', '--dangerous', snap_path])
         subprocess.check_call(['certbot', '--version'])
+        # Trusting plugins is a setting of the certbot snap itself, so it only needs to
+        # be done once for all the DNS plugins tested in this module.
+        subprocess.check_call(['snap', 'set', 'certbot', 'trust-plugin-with-root=ok'])
         yield
     finally:
         subprocess.call(['snap', 'remove', 'certbot'])
 
 
+# All DNS plugins are connected to the same system-wide certbot snap, installed and
+# removed by the module fixture, so these tests must share a single xdist worker.
+@pytest.mark.xdist_group(name='dns-snap')
 def test_dns_plugin_install(dns_snap_path: str) -> None:
     """
     Test that each DNS plugin Certbot snap can be installed
     and is usable with the Certbot snap.
     """
-    match = re.match(r'^certbot-(dns-\w+)_.*\.snap$', os.path.basename(dns_snap_path))
+    match = _DNS_SNAP_RE.match(os.path.basename(dns_snap_path))
     assert match
     plugin_name = match.group(1)
-    snap_name = 'certbot-{0}'.format(plugin_name)
-    assert plugin_name not in subprocess.check_output(['certbot', 'plugins', '--prepare'],
-                                                      universal_newlines=True)
+    snap_name = f'certbot-{plugin_name}'
+    # Checking that the plugin snap is not installed is much cheaper than
+    # running `certbot plugins --prepare`.
+    assert subprocess.call(['snap', 'list', snap_name],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) != 0
 
     try:
         subprocess.check_call(['snap', 'install', '--dangerous', dns_snap_path])
-        subprocess.check_call(['snap', 'set', 'certbot', 'trust-plugin-with-root=ok'])
         subprocess.check_call(['snap', 'connect', 'certbot:plugin', snap_name])
 
         assert plugin_name in subprocess.check_output(['certbot', 'plugins', '--prepare'],
                                                       universal_newlines=True)
         subprocess.check_call(['snap', 'connect', snap_name + ':certbot-metadata',
             'certbot:certbot-metadata'])
+        # Installing the plugin snap again is intentional: it refreshes the plugin
+        # while its certbot-metadata plug is connected, which runs the snap hooks
+        # checking that the plugin is compatible with the installed certbot snap.
         subprocess.check_call(['snap', 'install', '--dangerous', dns_snap_path])
     finally:
         subprocess.call(['snap', 'remove', plugin_name])
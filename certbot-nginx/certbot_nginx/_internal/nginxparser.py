@@ -122,13 +122,13 @@ class UnspacedList(list[Any]):
     """Wrap a list [of lists], making any whitespace entries magically invisible"""
 
     def __init__(self, list_source: Iterable[Any]) -> None:
-        # ensure our argument is not a generator, and duplicate any sublists
-        self.spaced = copy.deepcopy(list(list_source))
+        # ensure our argument is not a generator; sublists are duplicated below
+        self.spaced = list(list_source)
         self.dirty = False
 
         # Turn self into a version of the source list that has spaces removed
         # and all sub-lists also UnspacedList()ed
-        super().__init__(list_source)
+        super().__init__(self.spaced)
         for i, entry in reversed(list(enumerate(self))):
             if isinstance(entry, list):
                 sublist = UnspacedList(entry)
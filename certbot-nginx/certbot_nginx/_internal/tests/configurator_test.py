@@ -1,9 +1,17 @@
 """Test for certbot_nginx._internal.configurator."""
+import copy
+import functools
+import importlib.resources
+import shutil
+import socket
+import subprocess
 import sys
+import types
 from unittest import mock
 
 from cryptography import x509
 from cryptography.hazmat.primitives import serialization
+import josepy as jose
 import pytest
 
 from acme import challenges
@@ -11,27 +19,452 @@ from acme import messages
 from certbot import achallenges
 from certbot import crypto_util
 from certbot import errors
+from certbot import util as certbot_util
+from certbot.compat import filesystem
 from certbot.compat import os
 from certbot.tests import util as certbot_test_util
 from certbot_nginx._internal import obj
 from certbot_nginx._internal import parser
 from certbot_nginx._internal.configurator import _redirect_block_for_domain
+from certbot_nginx._internal.constants import ALL_SSL_OPTIONS_HASHES
 from certbot_nginx._internal.nginxparser import UnspacedList
 from certbot_nginx._internal.tests import test_util as util
 
+# Names of the vhosts of the test configuration files, and the files in which
+# the vhost chosen for a given name is expected to be found.
+_CONF_NAMES = {'localhost_conf': {'localhost', r'~^(www\.)?(example|bar)\.'},
+               'server_conf': {'somename', 'another.alias', 'alias'},
+               'example_conf': {'.example.com', 'example.*'},
+               'foo_conf': {'*.www.foo.com', '*.www.example.com'},
+               'ipv6_conf': {'ipv6.com'}}
+_CONF_PATH = {key: os.path.normpath(value) for key, value in {
+    'localhost': "etc_nginx/nginx.conf",
+    'alias': "etc_nginx/nginx.conf",
+    'example.com': "etc_nginx/sites-enabled/example.com",
+    'example.com.uk.test': "etc_nginx/sites-enabled/example.com",
+    'www.example.com': "etc_nginx/sites-enabled/example.com",
+    'test.www.example.com': "etc_nginx/foo.conf",
+    'abc.www.foo.com': "etc_nginx/foo.conf",
+    'www.bar.co.uk': "etc_nginx/nginx.conf",
+    'ipv6.com': "etc_nginx/sites-enabled/ipv6.com",
+}.items()}
+
+# Certificate, key, chain and fullchain paths most tests deploy.
+_CERT_PATHS = ("example/cert.pem", "example/key.pem", "example/chain.pem",
+               "example/fullchain.pem")
+
+# Output of `nginx -V` and the version get_version() is expected to parse from it.
+_NGINX_VERSION_FIXTURES = (
+    ("\n".join(["nginx version: nginx/1.4.2",
+                "built by clang 6.0 (clang-600.0.56) (based on LLVM 3.5svn)",
+                "TLS SNI support enabled",
+                "configure arguments: --prefix=/usr/local/Cellar/"
+                "nginx/1.6.2 --with-http_ssl_module"]), (1, 4, 2)),
+    ("\n".join(["nginx version: nginx/0.9",
+                "built by clang 6.0 (clang-600.0.56) (based on LLVM 3.5svn)",
+                "TLS SNI support enabled",
+                "configure arguments: --with-http_ssl_module"]), (0, 9)),
+)
+# Output of `nginx -V` and the error get_version() is expected to raise on it.
+_BAD_NGINX_VERSION_FIXTURES = (
+    ("\n".join(["blah 0.0.1",
+                "built by clang 6.0 (clang-600.0.56) (based on LLVM 3.5svn)",
+                "TLS SNI support enabled",
+                "configure arguments: --with-http_ssl_module"]), errors.PluginError),
+    ("\n".join(["nginx version: nginx/1.4.2",
+                "TLS SNI support enabled"]), errors.PluginError),
+    ("\n".join(["nginx version: nginx/1.4.2",
+                "built by clang 6.0 (clang-600.0.56) (based on LLVM 3.5svn)",
+                "configure arguments: --with-http_ssl_module"]), errors.PluginError),
+    ("\n".join(["nginx version: nginx/0.8.1",
+                "built by clang 6.0 (clang-600.0.56) (based on LLVM 3.5svn)",
+                "TLS SNI support enabled",
+                "configure arguments: --with-http_ssl_module"]), errors.NotSupportedError),
+)
+# Output of `nginx -V` with a slot for the OpenSSL line. The lines are indented
+# so that the parsing of leading whitespace remains covered.
+_OPENSSL_VERSION_TEMPLATE = ("\n"
+                             "                nginx version: nginx/1.15.5\n"
+                             "                built by gcc 5.4.0 20160609"
+                             " (Ubuntu 5.4.0-6ubuntu1~16.04.9)\n"
+                             "{}"
+                             "                TLS SNI support enabled\n"
+                             "                configure arguments:\n"
+                             "            ")
+# Output of `nginx -V` and the OpenSSL version _get_openssl_version() is
+# expected to parse from it.
+_OPENSSL_VERSION_FIXTURES = tuple((_OPENSSL_VERSION_TEMPLATE.format(line), expected) for
+                                  line, expected in (
+    ("                built with OpenSSL 1.0.2g  1 Mar 2016\n", "1.0.2g"),
+    ("                built with OpenSSL 1.0.2-beta1  1 Mar 2016\n", "1.0.2-beta1"),
+    ("                built with OpenSSL 1.0.2  1 Mar 2016\n", "1.0.2"),
+    ("                built with OpenSSL 1.0.2g  1 Mar 2016"
+     " (running with OpenSSL 1.0.2a  1 Mar 2016)\n", "1.0.2a"),
+    ("                built with LibreSSL 2.2.2\n", ""),
+    ("", ""),
+))
+
+# Stand-in for the socket module with deterministic host name lookups.
+_FAKE_SOCKET = types.SimpleNamespace(
+    AF_INET=socket.AF_INET, AF_INET6=socket.AF_INET6, inet_pton=socket.inet_pton,
+    herror=socket.herror, timeout=socket.timeout,
+    gethostname=lambda: "example.net",
+    gethostbyaddr=lambda unused_addr: ("155.225.50.69.nephoscale.net", [], []))
+
+# The packaged TLS configuration files do not change during a test run, so each
+# one only needs to be hashed once. This is bound before any test patches sha256sum.
+_packaged_file_sha256sum = functools.lru_cache(maxsize=None)(crypto_util.sha256sum)
+
+
+def _expected_redirect(domain):
+    """Redirect block the configurator adds for domain, as found in the parsed tree."""
+    return UnspacedList(_redirect_block_for_domain(domain))[0]
+
+
+class _FakeRun:
+    """Stand-in for subprocess.run, much cheaper than a MagicMock.
+
+    Every call returns a process with the attributes' current values, or raises
+    error if it is set.
+    """
+
+    def __init__(self, returncode=0, stdout="", stderr="", error=None):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, args, **unused_kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return subprocess.CompletedProcess(args, self.returncode, self.stdout, self.stderr)
+
+
+def _deployed_example_conf(config):
+    """sites-enabled/example.com after deploying example/ certificates to www.example.com."""
+    return [[['server'],
+             [['listen', '69.50.225.155:9000'],
+              ['listen', '127.0.0.1'],
+              ['server_name', '.example.com'],
+              ['server_name', 'example.*'],
 
-class NginxConfiguratorTest(util.NginxTest):
-    """Test a semi complex vhost configuration."""
+              ['listen', '5001', 'ssl'],
+              ['ssl_certificate', 'example/fullchain.pem'],
+              ['ssl_certificate_key', 'example/key.pem'],
+              ['include', config.mod_ssl_conf],
+              ['ssl_dhparam', config.ssl_dhparams]]]]
+
+
+def _deployed_somename_server(config):
+    """Server block of nginx.conf after deploying /etc/nginx/ certificates to another.alias."""
+    return [['server'],
+            [['listen', '8000'],
+             ['listen', 'somename:8080'],
+             ['include', 'server.conf'],
+             [['location', '/'],
+              [['root', 'html'],
+               ['index', 'index.html', 'index.htm']]],
+             ['listen', '5001', 'ssl'],
+             ['ssl_certificate', '/etc/nginx/fullchain.pem'],
+             ['ssl_certificate_key', '/etc/nginx/key.pem'],
+             ['include', config.mod_ssl_conf],
+             ['ssl_dhparam', config.ssl_dhparams]]]
+
+
+def _split_ssl_server(config, *extra):
+    """SSL server block split from the example.com one, followed by extra directives."""
+    return [['server'], [
+        ['server_name', '.example.com'],
+        ['server_name', 'example.*'],
+        ['listen', '5001', 'ssl'], ['#', ' managed by Certbot'],
+        ['ssl_certificate', 'example/fullchain.pem'], ['#', ' managed by Certbot'],
+        ['ssl_certificate_key', 'example/key.pem'], ['#', ' managed by Certbot'],
+        ['include', config.mod_ssl_conf], ['#', ' managed by Certbot'],
+        ['ssl_dhparam', config.ssl_dhparams], ['#', ' managed by Certbot'],
+        [], [], *extra]]
+
+
+def _split_for_redirect_conf(config):
+    """sites-enabled/example.com after deploying a certificate and redirecting to HTTPS."""
+    return [_split_ssl_server(config),
+            [['server'], [
+                [['if', '($host', '=', 'www.example.com)'], [
+                    ['return', '301', 'https://$host$request_uri']]],
+                ['#', ' managed by Certbot'], [],
+                ['listen', '69.50.225.155:9000'],
+                ['listen', '127.0.0.1'],
+                ['server_name', '.example.com'],
+                ['server_name', 'example.*'],
+                ['return', '404'], ['#', ' managed by Certbot'], [], [], []]]]
+
+
+def _split_for_headers_conf(config):
+    """sites-enabled/example.com after deploying a certificate and enabling HSTS."""
+    return [_split_ssl_server(
+                config,
+                ['add_header', 'Strict-Transport-Security', '"max-age=31536000"', 'always'],
+                ['#', ' managed by Certbot'],
+                [], []),
+            [['server'], [
+                ['listen', '69.50.225.155:9000'],
+                ['listen', '127.0.0.1'],
+                ['server_name', '.example.com'],
+                ['server_name', 'example.*'],
+                [], []]]]
+
+
+def _make_dirs(root):
+    """Create the config, work and logs directories of a configurator in root."""
+    dirs = [root / name for name in ("config", "work", "logs")]
+    for path in dirs:
+        path.mkdir()
+    return [str(path) for path in dirs]
+
+
+@pytest.fixture(scope="class")
+def shared_config(tmp_path_factory):
+    """NginxConfigurator shared by all the tests of a class, which must not modify it.
+
+    It reads the packaged test configuration in place, without copying it.
+    """
+    tmp_path = tmp_path_factory.mktemp("nginx")
+    ref = importlib.resources.files(__package__) / "testdata" / "etc_nginx"
+    with importlib.resources.as_file(ref) as config_path, \
+            mock.patch('certbot_nginx._internal.configurator.display_util.notify'):
+        # prepare() locks the server root by creating a file in it
+        with mock.patch("certbot_nginx._internal.configurator.util.lock_dir_until_exit"):
+            config = util.make_nginx_configurator(
+                certbot_test_util.make_config(str(tmp_path)),
+                filesystem.realpath(str(config_path)), *_make_dirs(tmp_path))
+        try:
+            yield config
+        finally:
+            certbot_util._release_locks()  # pylint: disable=protected-access
+
+
+@pytest.fixture
+def nginx_config(tmp_path):
+    """NginxConfigurator working on a private copy of the test configuration."""
+    config_path = tmp_path / "etc_nginx"
+    ref = importlib.resources.files(__package__) / "testdata" / "etc_nginx"
+    with importlib.resources.as_file(ref) as path:
+        shutil.copytree(path, config_path, symlinks=True)
+    try:
+        yield util.make_nginx_configurator(
+            certbot_test_util.make_config(str(tmp_path)), str(config_path),
+            *_make_dirs(tmp_path))
+    finally:
+        certbot_util._release_locks()  # pylint: disable=protected-access
+
+
+@pytest.fixture
+def config_copy(shared_config):
+    """In-memory copy of shared_config, for tests modifying the parsed configuration only."""
+    return copy.deepcopy(shared_config)
+
+
+# Keep the class on one xdist worker so that the shared configurator is only built once.
+@pytest.mark.xdist_group(name="nginx-read-only")
+class TestReadOnlyNginxConfigurator:
+    """Tests of NginxConfigurator that do not modify it, so it is built once for the class.
+
+    Tests that only modify the configuration in memory can use config_copy instead.
+
+    """
+
+    @pytest.fixture(scope="class", autouse=True)
+    def _class_mocks(self, request):
+        with mock.patch.multiple("certbot_nginx._internal.configurator",
+                                 socket=_FAKE_SOCKET, time=mock.DEFAULT) as mocks:
+            request.cls.mock_time = mocks["time"]
+            yield
+
+    @pytest.fixture(autouse=True)
+    def _set_config(self, shared_config):
+        self.config = shared_config
+        self.mock_time.reset_mock()
+        self.fake_run = _FakeRun()
+        with mock.patch("certbot_nginx._internal.configurator.subprocess.run",
+                        new=self.fake_run):
+            yield
+
+    def test_prepare(self):
+        assert (1, 6, 2) == self.config.version
+        assert 15 == len(self.config.parser.parsed)
+
+    def test_get_all_names(self):
+        names = self.config.get_all_names()
+        assert names == {
+            "155.225.50.69.nephoscale.net", "www.example.org", "another.alias",
+             "migration.com", "summer.com", "geese.com", "sslon.com",
+             "globalssl.com", "globalsslsetssl.com", "ipv6.com", "ipv6ssl.com",
+             "headers.com", "example.net", "ssl.both.com", 'addr-80.com'}
+
+    def test_supported_enhancements(self):
+        assert ['redirect', 'ensure-http-header', 'staple-ocsp'] == \
+                         self.config.supported_enhancements()
+
+    def test_enhance(self):
+        with pytest.raises(errors.PluginError):
+            self.config.enhance('myhost', 'unknown_enhancement')
+
+    def test_get_chall_pref(self):
+        assert [challenges.HTTP01] == \
+                         self.config.get_chall_pref('myhost')
+
+    def test_ipv6only(self):
+        # ipv6_info: (ipv6_active, ipv6only_present)
+        assert (True, False) == self.config.ipv6_info("[::]", "80")
+        # Port 443 has ipv6only=on because of ipv6ssl.com vhost
+        assert (True, True) == self.config.ipv6_info("[::]", "443")
+
+    def test_more_info(self):
+        assert 'nginx.conf' in self.config.more_info()
+
+    def test_deploy_cert_requires_fullchain_path(self, config_copy):
+        config_copy.version = (1, 3, 1)
+        with pytest.raises(errors.PluginError):
+            config_copy.deploy_cert("www.example.com",
+            "example/cert.pem",
+            "example/key.pem",
+            "example/chain.pem",
+            None)
+
+    @pytest.mark.parametrize("stderr,expected", _NGINX_VERSION_FIXTURES)
+    def test_get_version(self, stderr, expected):
+        self.fake_run.stderr = stderr
+        assert self.config.get_version() == expected
+
+    @pytest.mark.parametrize("stderr,error", _BAD_NGINX_VERSION_FIXTURES)
+    def test_get_version_bad_output(self, stderr, error):
+        self.fake_run.stderr = stderr
+        with pytest.raises(error):
+            self.config.get_version()
+
+    def test_get_version_no_nginx(self):
+        self.fake_run.error = OSError("Can't find program")
+        with pytest.raises(errors.PluginError):
+            self.config.get_version()
+
+    @pytest.mark.parametrize("stderr,expected", _OPENSSL_VERSION_FIXTURES)
+    def test_get_openssl_version(self, stderr, expected):
+        # pylint: disable=protected-access
+        self.fake_run.stderr = stderr
+        assert self.config._get_openssl_version() == expected
+
+    def test_nginx_restart(self):
+        self.config.restart()
+        assert self.fake_run.calls == 1
+        self.mock_time.sleep.assert_called_once_with(0.1234)
+
+    @mock.patch("certbot_nginx._internal.configurator.logger.debug")
+    def test_nginx_restart_fail(self, mock_log_debug):
+        self.fake_run.returncode = 1
+        with pytest.raises(errors.MisconfigurationError):
+            self.config.restart()
+        assert self.fake_run.calls == 2
+        mock_log_debug.assert_called_once_with("nginx reload failed:\n%s", "")
+
+    def test_no_nginx_start(self):
+        self.fake_run.error = OSError("Can't find program")
+        with pytest.raises(errors.MisconfigurationError):
+            self.config.restart()
+
+    @mock.patch("certbot.util.run_script")
+    def test_config_test_bad_process(self, mock_run_script):
+        mock_run_script.side_effect = errors.SubprocessError
+        with pytest.raises(errors.MisconfigurationError):
+            self.config.config_test()
+
+    @mock.patch("certbot.util.run_script")
+    def test_config_test(self, _):
+        self.config.config_test()
+
+    @mock.patch("certbot.reverter.Reverter.recovery_routine")
+    def test_recovery_routine_throws_error_from_reverter(self, mock_recovery_routine):
+        mock_recovery_routine.side_effect = errors.ReverterError("foo")
+        with pytest.raises(errors.PluginError):
+            self.config.recovery_routine()
+
+    @mock.patch("certbot.reverter.Reverter.rollback_checkpoints")
+    def test_rollback_checkpoints_throws_error_from_reverter(self, mock_rollback_checkpoints):
+        mock_rollback_checkpoints.side_effect = errors.ReverterError("foo")
+        with pytest.raises(errors.PluginError):
+            self.config.rollback_checkpoints()
+
+    @mock.patch("certbot.reverter.Reverter.revert_temporary_config")
+    def test_revert_challenge_config_throws_error_from_reverter(self, mock_revert_temporary_config):
+        mock_revert_temporary_config.side_effect = errors.ReverterError("foo")
+        with pytest.raises(errors.PluginError):
+            self.config.revert_challenge_config()
+
+    def test_get_snakeoil_paths(self):
+        # Only creates new files in the work directory, the configuration is untouched.
+        # pylint: disable=protected-access
+        cert, key = self.config._get_snakeoil_paths()
+        assert os.path.exists(cert)
+        assert os.path.exists(key)
+        with open(cert, "rb") as cert_file:
+            x509.load_pem_x509_certificate(cert_file.read())
+        with open(key, "rb") as key_file:
+            serialization.load_pem_private_key(key_file.read(), password=None)
+
+    def test_choose_auth_vhosts(self):
+        """choose_auth_vhosts correctly selects duplicative and HTTP/HTTPS vhosts"""
+        http, https = self.config.choose_auth_vhosts('ssl.both.com')
+        assert len(http) == 4
+        assert len(https) == 2
+        assert http[0].names == {'ssl.both.com'}
+        assert http[1].names == {'ssl.both.com'}
+        assert http[2].names == {'ssl.both.com'}
+        assert http[3].names == {'*.both.com'}
+        assert https[0].names == {'ssl.both.com'}
+        assert https[1].names == {'*.both.com'}
+
+    @pytest.mark.parametrize("name,conf", [
+        ('alias', 'server_conf'),
+        ('example.com', 'example_conf'),
+        ('localhost', 'localhost_conf'),
+        ('example.com.uk.test', 'example_conf'),
+        ('www.example.com', 'example_conf'),
+        ('test.www.example.com', 'foo_conf'),
+        ('abc.www.foo.com', 'foo_conf'),
+        ('www.bar.co.uk', 'localhost_conf'),
+        ('ipv6.com', 'ipv6_conf'),
+    ])
+    def test_choose_vhosts(self, name, conf, config_copy):
+        vhost = config_copy.choose_vhosts(name)[0]
+        path = os.path.relpath(vhost.filep, os.path.dirname(config_copy.parser.root))
+
+        assert _CONF_NAMES[conf] == vhost.names
+        assert _CONF_PATH[name] == path
+        # IPv6 specific checks
+        if name == "ipv6.com":
+            assert vhost.ipv6_enabled()
+            # Make sure that we have SSL enabled also for IPv6 addr
+            assert any(True for x in vhost.addrs if x.ssl and x.ipv6)
 
-    def setUp(self):
-        super().setUp()
+    @pytest.mark.parametrize("name", ['www.foo.com', 'example', 't.www.bar.co',
+                                      '69.255.225.155'])
+    def test_choose_vhosts_bad(self, name, config_copy):
+        with pytest.raises(errors.MisconfigurationError):
+            config_copy.choose_vhosts(name)
+
+
+class TestNginxConfigurator:
+    """Test a semi complex vhost configuration."""
 
-        self.config = self.get_nginx_configurator(
-            self.config_path, self.config_dir, self.work_dir, self.logs_dir)
+    @pytest.fixture(autouse=True)
+    def _set_up(self, nginx_config):
+        self.config = nginx_config
+        with mock.patch('certbot_nginx._internal.configurator.display_util.notify'):
+            yield
 
-        patch = mock.patch('certbot_nginx._internal.configurator.display_util.notify')
-        self.mock_notify = patch.start()
-        self.addCleanup(patch.stop)
+    def _vhost(self, name):
+        """Returns the first vhost of the configuration with the given name."""
+        return next(x for x in self.config.parser.get_vhosts() if name in x.names)
 
     @mock.patch("certbot_nginx._internal.configurator.util.exe_exists")
     def test_prepare_no_install(self, mock_exe_exists):
@@ -39,27 +472,23 @@ class NginxConfiguratorTest(util.NginxTest):
         with pytest.raises(errors.NoInstallationError):
             self.config.prepare()
 
-    def test_prepare(self):
-        assert (1, 6, 2) == self.config.version
-        assert 15 == len(self.config.parser.parsed)
-
     @mock.patch("certbot_nginx._internal.configurator.util.exe_exists")
-    @mock.patch("certbot_nginx._internal.configurator.subprocess.run")
-    def test_prepare_initializes_version(self, mock_run, mock_exe_exists):
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = "\n".join(
+    def test_prepare_initializes_version(self, mock_exe_exists):
+        fake_run = _FakeRun(stderr="\n".join(
                           ["nginx version: nginx/1.6.2",
                            "built by clang 6.0 (clang-600.0.56)"
                            " (based on LLVM 3.5svn)",
                            "TLS SNI support enabled",
                            "configure arguments: --prefix=/usr/local/Cellar/"
-                           "nginx/1.6.2 --with-http_ssl_module"])
+                           "nginx/1.6.2 --with-http_ssl_module"]))
 
         mock_exe_exists.return_value = True
 
         self.config.version = None
         self.config.config_test = mock.Mock()
-        self.config.prepare()
+        with mock.patch("certbot_nginx._internal.configurator.subprocess.run",
+                        new=fake_run):
+            self.config.prepare()
         assert (1, 6, 2) == self.config.version
 
     def test_prepare_locked(self):
@@ -87,31 +516,7 @@ class NginxConfiguratorTest(util.NginxTest):
             assert "lock" in err_msg
             assert self.config.conf("server-root") in err_msg
         else:  # pragma: no cover
-            self.fail("Exception wasn't raised!")
-
-    @mock.patch("certbot_nginx._internal.configurator.socket.gethostname")
-    @mock.patch("certbot_nginx._internal.configurator.socket.gethostbyaddr")
-    def test_get_all_names(self, mock_gethostbyaddr, mock_gethostname):
-        mock_gethostbyaddr.return_value = ('155.225.50.69.nephoscale.net', [], [])
-        mock_gethostname.return_value = ('example.net')
-        names = self.config.get_all_names()
-        assert names == {
-            "155.225.50.69.nephoscale.net", "www.example.org", "another.alias",
-             "migration.com", "summer.com", "geese.com", "sslon.com",
-             "globalssl.com", "globalsslsetssl.com", "ipv6.com", "ipv6ssl.com",
-             "headers.com", "example.net", "ssl.both.com", 'addr-80.com'}
-
-    def test_supported_enhancements(self):
-        assert ['redirect', 'ensure-http-header', 'staple-ocsp'] == \
-                         self.config.supported_enhancements()
-
-    def test_enhance(self):
-        with pytest.raises(errors.PluginError):
-            self.config.enhance('myhost', 'unknown_enhancement')
-
-    def test_get_chall_pref(self):
-        assert [challenges.HTTP01] == \
-                         self.config.get_chall_pref('myhost')
+            pytest.fail("Exception wasn't raised!")
 
     def test_save(self):
         filep = self.config.parser.abs_path('sites-enabled/example.com')
@@ -135,71 +540,6 @@ class NginxConfiguratorTest(util.NginxTest):
                             ['#', parser.COMMENT]]]] == \
                          parsed[filep]
 
-    def test_choose_vhosts_alias(self):
-        self._test_choose_vhosts_common('alias', 'server_conf')
-
-    def test_choose_vhosts_example_com(self):
-        self._test_choose_vhosts_common('example.com', 'example_conf')
-
-    def test_choose_vhosts_localhost(self):
-        self._test_choose_vhosts_common('localhost', 'localhost_conf')
-
-    def test_choose_vhosts_example_com_uk_test(self):
-        self._test_choose_vhosts_common('example.com.uk.test', 'example_conf')
-
-    def test_choose_vhosts_www_example_com(self):
-        self._test_choose_vhosts_common('www.example.com', 'example_conf')
-
-    def test_choose_vhosts_test_www_example_com(self):
-        self._test_choose_vhosts_common('test.www.example.com', 'foo_conf')
-
-    def test_choose_vhosts_abc_www_foo_com(self):
-        self._test_choose_vhosts_common('abc.www.foo.com', 'foo_conf')
-
-    def test_choose_vhosts_www_bar_co_uk(self):
-        self._test_choose_vhosts_common('www.bar.co.uk', 'localhost_conf')
-
-    def test_choose_vhosts_ipv6_com(self):
-        self._test_choose_vhosts_common('ipv6.com', 'ipv6_conf')
-
-    def _test_choose_vhosts_common(self, name, conf):
-        conf_names = {'localhost_conf': {'localhost', r'~^(www\.)?(example|bar)\.'},
-                 'server_conf': {'somename', 'another.alias', 'alias'},
-                 'example_conf': {'.example.com', 'example.*'},
-                 'foo_conf': {'*.www.foo.com', '*.www.example.com'},
-                 'ipv6_conf': {'ipv6.com'}}
-
-        conf_path = {'localhost': "etc_nginx/nginx.conf",
-                   'alias': "etc_nginx/nginx.conf",
-                   'example.com': "etc_nginx/sites-enabled/example.com",
-                   'example.com.uk.test': "etc_nginx/sites-enabled/example.com",
-                   'www.example.com': "etc_nginx/sites-enabled/example.com",
-                   'test.www.example.com': "etc_nginx/foo.conf",
-                   'abc.www.foo.com': "etc_nginx/foo.conf",
-                   'www.bar.co.uk': "etc_nginx/nginx.conf",
-                   'ipv6.com': "etc_nginx/sites-enabled/ipv6.com"}
-        conf_path = {key: os.path.normpath(value) for key, value in conf_path.items()}
-
-        vhost = self.config.choose_vhosts(name)[0]
-        path = os.path.relpath(vhost.filep, self.temp_dir)
-
-        assert conf_names[conf] == vhost.names
-        assert conf_path[name] == path
-        # IPv6 specific checks
-        if name == "ipv6.com":
-            assert vhost.ipv6_enabled()
-            # Make sure that we have SSL enabled also for IPv6 addr
-            assert any(True for x in vhost.addrs if x.ssl and x.ipv6)
-
-    def test_choose_vhosts_bad(self):
-        bad_results = ['www.foo.com', 'example', 't.www.bar.co',
-                       '69.255.225.155']
-
-        for name in bad_results:
-            with self.subTest(name=name):
-                with pytest.raises(errors.MisconfigurationError):
-                    self.config.choose_vhosts(name)
-
     def test_choose_vhosts_keep_ip_address(self):
         # no listen on port 80
         # listen       69.50.225.155:9000;
@@ -227,46 +567,19 @@ class NginxConfiguratorTest(util.NginxTest):
         assert obj.Addr.fromstring("[1:20::300]:5001 ssl ipv6only=on") in vhost.addrs
 
 
-    def test_ipv6only(self):
-        # ipv6_info: (ipv6_active, ipv6only_present)
-        assert (True, False) == self.config.ipv6_info("[::]", "80")
-        # Port 443 has ipv6only=on because of ipv6ssl.com vhost
-        assert (True, True) == self.config.ipv6_info("[::]", "443")
-
     def test_ipv6only_detection(self):
         self.config.version = (1, 3, 1)
 
-        self.config.deploy_cert(
-            "ipv6.com",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            "example/fullchain.pem")
+        self.config.deploy_cert("ipv6.com", *_CERT_PATHS)
 
         for addr in self.config.choose_vhosts("ipv6.com")[0].addrs:
             assert not addr.ipv6only
 
-    def test_more_info(self):
-        assert 'nginx.conf' in self.config.more_info()
-
-    def test_deploy_cert_requires_fullchain_path(self):
-        self.config.version = (1, 3, 1)
-        with pytest.raises(errors.PluginError):
-            self.config.deploy_cert("www.example.com",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            None)
-
     @mock.patch('certbot_nginx._internal.parser.NginxParser.update_or_add_server_directives')
     def test_deploy_cert_raise_on_add_error(self, mock_update_or_add_server_directives):
         mock_update_or_add_server_directives.side_effect = errors.MisconfigurationError()
         with pytest.raises(errors.PluginError):
-            self.config.deploy_cert("migration.com",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            "example/fullchain.pem")
+            self.config.deploy_cert("migration.com", *_CERT_PATHS)
 
     def test_deploy_cert(self):
         server_conf = self.config.parser.abs_path('server.conf')
@@ -275,59 +588,36 @@ class NginxConfiguratorTest(util.NginxTest):
         self.config.version = (1, 3, 1)
 
         # Get the default SSL vhost
-        self.config.deploy_cert(
-            "www.example.com",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            "example/fullchain.pem")
+        self.config.deploy_cert("www.example.com", *_CERT_PATHS)
         self.config.deploy_cert(
             "another.alias",
             "/etc/nginx/cert.pem",
             "/etc/nginx/key.pem",
             "/etc/nginx/chain.pem",
             "/etc/nginx/fullchain.pem")
-        self.config.save()
-
-        self.config.parser.load()
 
         parsed_example_conf = util.filter_comments(self.config.parser.parsed[example_conf])
         parsed_server_conf = util.filter_comments(self.config.parser.parsed[server_conf])
         parsed_nginx_conf = util.filter_comments(self.config.parser.parsed[nginx_conf])
 
-        assert [[['server'],
-                           [
-                            ['listen', '69.50.225.155:9000'],
-                            ['listen', '127.0.0.1'],
-                            ['server_name', '.example.com'],
-                            ['server_name', 'example.*'],
-
-                            ['listen', '5001', 'ssl'],
-                            ['ssl_certificate', 'example/fullchain.pem'],
-                            ['ssl_certificate_key', 'example/key.pem'],
-                            ['include', self.config.mod_ssl_conf],
-                            ['ssl_dhparam', self.config.ssl_dhparams],
-                            ]]] == \
-                         parsed_example_conf
+        assert _deployed_example_conf(self.config) == parsed_example_conf
         assert [['server_name', 'somename', 'alias', 'another.alias']] == \
                          parsed_server_conf
         assert util.contains_at_depth(
-            parsed_nginx_conf,
-            [['server'],
-             [
-              ['listen', '8000'],
-              ['listen', 'somename:8080'],
-              ['include', 'server.conf'],
-              [['location', '/'],
-               [['root', 'html'],
-                ['index', 'index.html', 'index.htm']]],
-              ['listen', '5001', 'ssl'],
-              ['ssl_certificate', '/etc/nginx/fullchain.pem'],
-              ['ssl_certificate_key', '/etc/nginx/key.pem'],
-              ['include', self.config.mod_ssl_conf],
-              ['ssl_dhparam', self.config.ssl_dhparams],
-            ]],
-            2)
+            parsed_nginx_conf, _deployed_somename_server(self.config), 2)
+
+    def test_save_roundtrip(self):
+        self.config.version = (1, 3, 1)
+        self.config.deploy_cert("www.example.com", *_CERT_PATHS)
+        self.config.enhance("www.example.com", "redirect")
+        in_memory = {filename: util.filter_comments(tree)
+                     for filename, tree in self.config.parser.parsed.items()}
+        self.config.save()
+
+        self.config.parser.load()
+
+        for filename, tree in in_memory.items():
+            assert tree == util.filter_comments(self.config.parser.parsed[filename])
 
     def test_deploy_cert_add_explicit_listen(self):
         migration_conf = self.config.parser.abs_path('sites-enabled/migration.com')
@@ -337,8 +627,7 @@ class NginxConfiguratorTest(util.NginxTest):
             "summer/key.pem",
             "summer/chain.pem",
             "summer/fullchain.pem")
-        self.config.save()
-        self.config.parser.load()
+
         parsed_migration_conf = util.filter_comments(self.config.parser.parsed[migration_conf])
         assert [['server'],
                           [
@@ -360,15 +649,16 @@ class NginxConfiguratorTest(util.NginxTest):
     def test_perform_and_cleanup(self, mock_revert, mock_restart, mock_http_perform):
         # Only tests functionality specific to configurator.perform
         # Note: As more challenges are offered this will have to be expanded
+        rsa512jwk = jose.JWKRSA.load(certbot_test_util.load_vector("rsa512_key.pem"))
         achall = achallenges.KeyAuthorizationAnnotatedChallenge(
             challb=messages.ChallengeBody(
                 chall=challenges.HTTP01(token=b"m8TdO1qik4JVFtgPPurJmg"),
                 uri="https://ca.org/chall1_uri",
                 status=messages.Status("pending"),
-            ), domain="example.com", account_key=self.rsa512jwk)
+            ), domain="example.com", account_key=rsa512jwk)
 
         expected = [
-            achall.response(self.rsa512jwk),
+            achall.response(rsa512jwk),
         ]
 
         mock_http_perform.return_value = expected[:]
@@ -382,206 +672,16 @@ class NginxConfiguratorTest(util.NginxTest):
         assert mock_revert.call_count == 1
         assert mock_restart.call_count == 2
 
-    @mock.patch("certbot_nginx._internal.configurator.subprocess.run")
-    def test_get_version(self, mock_run):
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = "\n".join(
-                          ["nginx version: nginx/1.4.2",
-                           "built by clang 6.0 (clang-600.0.56)"
-                           " (based on LLVM 3.5svn)",
-                           "TLS SNI support enabled",
-                           "configure arguments: --prefix=/usr/local/Cellar/"
-                           "nginx/1.6.2 --with-http_ssl_module"])
-        assert self.config.get_version() == (1, 4, 2)
-
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = "\n".join(
-                          ["nginx version: nginx/0.9",
-                           "built by clang 6.0 (clang-600.0.56)"
-                           " (based on LLVM 3.5svn)",
-                           "TLS SNI support enabled",
-                           "configure arguments: --with-http_ssl_module"])
-        assert self.config.get_version() == (0, 9)
-
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = "\n".join(
-                          ["blah 0.0.1",
-                           "built by clang 6.0 (clang-600.0.56)"
-                           " (based on LLVM 3.5svn)",
-                           "TLS SNI support enabled",
-                           "configure arguments: --with-http_ssl_module"])
-        with pytest.raises(errors.PluginError):
-            self.config.get_version()
-
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = "\n".join(
-                          ["nginx version: nginx/1.4.2",
-                           "TLS SNI support enabled"])
-        with pytest.raises(errors.PluginError):
-            self.config.get_version()
-
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = "\n".join(
-                          ["nginx version: nginx/1.4.2",
-                           "built by clang 6.0 (clang-600.0.56)"
-                           " (based on LLVM 3.5svn)",
-                           "configure arguments: --with-http_ssl_module"])
-        with pytest.raises(errors.PluginError):
-            self.config.get_version()
-
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = "\n".join(
-                          ["nginx version: nginx/0.8.1",
-                           "built by clang 6.0 (clang-600.0.56)"
-                           " (based on LLVM 3.5svn)",
-                           "TLS SNI support enabled",
-                           "configure arguments: --with-http_ssl_module"])
-        with pytest.raises(errors.NotSupportedError):
-            self.config.get_version()
-
-        mock_run.side_effect = OSError("Can't find program")
-        with pytest.raises(errors.PluginError):
-            self.config.get_version()
-
-    @mock.patch("certbot_nginx._internal.configurator.subprocess.run")
-    def test_get_openssl_version(self, mock_run):
-        # pylint: disable=protected-access
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = """
-                nginx version: nginx/1.15.5
-                built by gcc 5.4.0 20160609 (Ubuntu 5.4.0-6ubuntu1~16.04.9)
-                built with OpenSSL 1.0.2g  1 Mar 2016
-                TLS SNI support enabled
-                configure arguments:
-            """
-        assert self.config._get_openssl_version() == "1.0.2g"
-
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = """
-                nginx version: nginx/1.15.5
-                built by gcc 5.4.0 20160609 (Ubuntu 5.4.0-6ubuntu1~16.04.9)
-                built with OpenSSL 1.0.2-beta1  1 Mar 2016
-                TLS SNI support enabled
-                configure arguments:
-            """
-        assert self.config._get_openssl_version() == "1.0.2-beta1"
-
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = """
-                nginx version: nginx/1.15.5
-                built by gcc 5.4.0 20160609 (Ubuntu 5.4.0-6ubuntu1~16.04.9)
-                built with OpenSSL 1.0.2  1 Mar 2016
-                TLS SNI support enabled
-                configure arguments:
-            """
-        assert self.config._get_openssl_version() == "1.0.2"
-
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = """
-                nginx version: nginx/1.15.5
-                built by gcc 5.4.0 20160609 (Ubuntu 5.4.0-6ubuntu1~16.04.9)
-                built with OpenSSL 1.0.2g  1 Mar 2016 (running with OpenSSL 1.0.2a  1 Mar 2016)
-                TLS SNI support enabled
-                configure arguments:
-            """
-        assert self.config._get_openssl_version() == "1.0.2a"
-
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = """
-                nginx version: nginx/1.15.5
-                built by gcc 5.4.0 20160609 (Ubuntu 5.4.0-6ubuntu1~16.04.9)
-                built with LibreSSL 2.2.2
-                TLS SNI support enabled
-                configure arguments:
-            """
-        assert self.config._get_openssl_version() == ""
-
-        mock_run.return_value.stdout = ""
-        mock_run.return_value.stderr = """
-                nginx version: nginx/1.15.5
-                built by gcc 5.4.0 20160609 (Ubuntu 5.4.0-6ubuntu1~16.04.9)
-                TLS SNI support enabled
-                configure arguments:
-            """
-        assert self.config._get_openssl_version() == ""
-
-    @mock.patch("certbot_nginx._internal.configurator.subprocess.run")
-    @mock.patch("certbot_nginx._internal.configurator.time")
-    def test_nginx_restart(self, mock_time, mock_run):
-        mocked = mock_run.return_value
-        mocked.stdout = ''
-        mocked.stderr = ''
-        mocked.returncode = 0
-        self.config.restart()
-        assert mock_run.call_count == 1
-        mock_time.sleep.assert_called_once_with(0.1234)
-
-    @mock.patch("certbot_nginx._internal.configurator.subprocess.run")
-    @mock.patch("certbot_nginx._internal.configurator.logger.debug")
-    def test_nginx_restart_fail(self, mock_log_debug, mock_run):
-        mocked = mock_run.return_value
-        mocked.stdout = ''
-        mocked.stderr = ''
-        mocked.returncode = 1
-        with pytest.raises(errors.MisconfigurationError):
-            self.config.restart()
-        assert mock_run.call_count == 2
-        mock_log_debug.assert_called_once_with("nginx reload failed:\n%s", "")
-
-    @mock.patch("certbot_nginx._internal.configurator.subprocess.run")
-    def test_no_nginx_start(self, mock_run):
-        mock_run.side_effect = OSError("Can't find program")
-        with pytest.raises(errors.MisconfigurationError):
-            self.config.restart()
-
-    @mock.patch("certbot.util.run_script")
-    def test_config_test_bad_process(self, mock_run_script):
-        mock_run_script.side_effect = errors.SubprocessError
-        with pytest.raises(errors.MisconfigurationError):
-            self.config.config_test()
-
-    @mock.patch("certbot.util.run_script")
-    def test_config_test(self, _):
-        self.config.config_test()
-
-    @mock.patch("certbot.reverter.Reverter.recovery_routine")
-    def test_recovery_routine_throws_error_from_reverter(self, mock_recovery_routine):
-        mock_recovery_routine.side_effect = errors.ReverterError("foo")
-        with pytest.raises(errors.PluginError):
-            self.config.recovery_routine()
-
-    @mock.patch("certbot.reverter.Reverter.rollback_checkpoints")
-    def test_rollback_checkpoints_throws_error_from_reverter(self, mock_rollback_checkpoints):
-        mock_rollback_checkpoints.side_effect = errors.ReverterError("foo")
-        with pytest.raises(errors.PluginError):
-            self.config.rollback_checkpoints()
-
-    @mock.patch("certbot.reverter.Reverter.revert_temporary_config")
-    def test_revert_challenge_config_throws_error_from_reverter(self, mock_revert_temporary_config):
-        mock_revert_temporary_config.side_effect = errors.ReverterError("foo")
-        with pytest.raises(errors.PluginError):
-            self.config.revert_challenge_config()
-
     @mock.patch("certbot.reverter.Reverter.add_to_checkpoint")
     def test_save_throws_error_from_reverter(self, mock_add_to_checkpoint):
         mock_add_to_checkpoint.side_effect = errors.ReverterError("foo")
         with pytest.raises(errors.PluginError):
             self.config.save()
 
-    def test_get_snakeoil_paths(self):
-        # pylint: disable=protected-access
-        cert, key = self.config._get_snakeoil_paths()
-        assert os.path.exists(cert)
-        assert os.path.exists(key)
-        with open(cert, "rb") as cert_file:
-            x509.load_pem_x509_certificate(cert_file.read())
-        with open(key, "rb") as key_file:
-            serialization.load_pem_private_key(key_file.read(), password=None)
-
     def test_redirect_enhance(self):
         # Test that we successfully add a redirect when there is
         # a listen directive
-        expected = UnspacedList(_redirect_block_for_domain("www.example.com"))[0]
+        expected = _expected_redirect("www.example.com")
 
         example_conf = self.config.parser.abs_path('sites-enabled/example.com')
         self.config.enhance("www.example.com", "redirect")
@@ -594,70 +694,24 @@ class NginxConfiguratorTest(util.NginxTest):
         migration_conf = self.config.parser.abs_path('sites-enabled/migration.com')
         self.config.enhance("migration.com", "redirect")
 
-        expected = UnspacedList(_redirect_block_for_domain("migration.com"))[0]
+        expected = _expected_redirect("migration.com")
 
         generated_conf = self.config.parser.parsed[migration_conf]
         assert util.contains_at_depth(generated_conf, expected, 2) is True
 
     def test_split_for_redirect(self):
         example_conf = self.config.parser.abs_path('sites-enabled/example.com')
-        self.config.deploy_cert(
-            "example.org",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            "example/fullchain.pem")
+        self.config.deploy_cert("example.org", *_CERT_PATHS)
         self.config.enhance("www.example.com", "redirect")
         generated_conf = self.config.parser.parsed[example_conf]
-        assert [[['server'], [
-               ['server_name', '.example.com'],
-               ['server_name', 'example.*'],
-               ['listen', '5001', 'ssl'], ['#', ' managed by Certbot'],
-               ['ssl_certificate', 'example/fullchain.pem'], ['#', ' managed by Certbot'],
-               ['ssl_certificate_key', 'example/key.pem'], ['#', ' managed by Certbot'],
-               ['include', self.config.mod_ssl_conf], ['#', ' managed by Certbot'],
-               ['ssl_dhparam', self.config.ssl_dhparams], ['#', ' managed by Certbot'],
-               [], []]],
-             [['server'], [
-               [['if', '($host', '=', 'www.example.com)'], [
-                 ['return', '301', 'https://$host$request_uri']]],
-               ['#', ' managed by Certbot'], [],
-               ['listen', '69.50.225.155:9000'],
-               ['listen', '127.0.0.1'],
-               ['server_name', '.example.com'],
-               ['server_name', 'example.*'],
-               ['return', '404'], ['#', ' managed by Certbot'], [], [], []]]] == \
-            generated_conf
+        assert _split_for_redirect_conf(self.config) == generated_conf
 
     def test_split_for_headers(self):
         example_conf = self.config.parser.abs_path('sites-enabled/example.com')
-        self.config.deploy_cert(
-            "example.org",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            "example/fullchain.pem")
+        self.config.deploy_cert("example.org", *_CERT_PATHS)
         self.config.enhance("www.example.com", "ensure-http-header", "Strict-Transport-Security")
         generated_conf = self.config.parser.parsed[example_conf]
-        assert [[['server'], [
-               ['server_name', '.example.com'],
-               ['server_name', 'example.*'],
-               ['listen', '5001', 'ssl'], ['#', ' managed by Certbot'],
-               ['ssl_certificate', 'example/fullchain.pem'], ['#', ' managed by Certbot'],
-               ['ssl_certificate_key', 'example/key.pem'], ['#', ' managed by Certbot'],
-               ['include', self.config.mod_ssl_conf], ['#', ' managed by Certbot'],
-               ['ssl_dhparam', self.config.ssl_dhparams], ['#', ' managed by Certbot'],
-               [], [],
-               ['add_header', 'Strict-Transport-Security', '"max-age=31536000"', 'always'],
-               ['#', ' managed by Certbot'],
-               [], []]],
-             [['server'], [
-               ['listen', '69.50.225.155:9000'],
-               ['listen', '127.0.0.1'],
-               ['server_name', '.example.com'],
-               ['server_name', 'example.*'],
-               [], []]]] == \
-            generated_conf
+        assert _split_for_headers_conf(self.config) == generated_conf
 
     def test_http_header_hsts(self):
         example_conf = self.config.parser.abs_path('sites-enabled/example.com')
@@ -706,8 +760,8 @@ class NginxConfiguratorTest(util.NginxTest):
         self.config.enhance("example.com", "redirect")
         self.config.enhance("example.org", "redirect")
 
-        expected1 = UnspacedList(_redirect_block_for_domain("example.com"))[0]
-        expected2 = UnspacedList(_redirect_block_for_domain("example.org"))[0]
+        expected1 = _expected_redirect("example.com")
+        expected2 = _expected_redirect("example.org")
 
         generated_conf = self.config.parser.parsed[example_conf]
         assert util.contains_at_depth(generated_conf, expected1, 2)
@@ -743,21 +797,28 @@ class NginxConfiguratorTest(util.NginxTest):
         assert util.contains_at_depth(
             generated_conf, ['ssl_stapling_verify', 'on'], 2)
 
+    def _foo_conf_server(self):
+        """Returns the directives of the server block of foo.conf."""
+        foo_conf = self.config.parser.abs_path('foo.conf')
+        return self.config.parser.parsed[foo_conf][2][1][0][1]
+
+    def _default_conf_server(self):
+        """Returns the directives of the server block of sites-enabled/default."""
+        default_conf = self.config.parser.abs_path('sites-enabled/default')
+        return self.config.parser.parsed[default_conf][0][1]
+
+    def _remove_default_conf_listens(self):
+        """Removes both default_server listen directives of sites-enabled/default."""
+        server = self._default_conf_server()
+        del server[0]
+        del server[0]
+
     def test_deploy_no_match_default_set(self):
         default_conf = self.config.parser.abs_path('sites-enabled/default')
-        foo_conf = self.config.parser.abs_path('foo.conf')
-        del self.config.parser.parsed[foo_conf][2][1][0][1][0] # remove default_server
+        del self._foo_conf_server()[0] # remove default_server
         self.config.version = (1, 3, 1)
 
-        self.config.deploy_cert(
-            "www.nomatch.com",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            "example/fullchain.pem")
-        self.config.save()
-
-        self.config.parser.load()
+        self.config.deploy_cert("www.nomatch.com", *_CERT_PATHS)
 
         parsed_default_conf = util.filter_comments(self.config.parser.parsed[default_conf])
 
@@ -782,36 +843,18 @@ class NginxConfiguratorTest(util.NginxTest):
                             ['ssl_dhparam', self.config.ssl_dhparams]]]] == \
                          parsed_default_conf
 
-        self.config.deploy_cert(
-            "nomatch.com",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            "example/fullchain.pem")
-        self.config.save()
-
-        self.config.parser.load()
+        self.config.deploy_cert("nomatch.com", *_CERT_PATHS)
 
         parsed_default_conf = util.filter_comments(self.config.parser.parsed[default_conf])
 
         assert util.contains_at_depth(parsed_default_conf, "nomatch.com", 3)
 
     def test_deploy_no_match_default_set_multi_level_path(self):
-        default_conf = self.config.parser.abs_path('sites-enabled/default')
         foo_conf = self.config.parser.abs_path('foo.conf')
-        del self.config.parser.parsed[default_conf][0][1][0]
-        del self.config.parser.parsed[default_conf][0][1][0]
+        self._remove_default_conf_listens()
         self.config.version = (1, 3, 1)
 
-        self.config.deploy_cert(
-            "www.nomatch.com",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            "example/fullchain.pem")
-        self.config.save()
-
-        self.config.parser.load()
+        self.config.deploy_cert("www.nomatch.com", *_CERT_PATHS)
 
         parsed_foo_conf = util.filter_comments(self.config.parser.parsed[foo_conf])
 
@@ -830,57 +873,34 @@ class NginxConfiguratorTest(util.NginxTest):
                          parsed_foo_conf[1][1][1]
 
     def test_deploy_no_match_no_default_set(self):
-        default_conf = self.config.parser.abs_path('sites-enabled/default')
-        foo_conf = self.config.parser.abs_path('foo.conf')
-        del self.config.parser.parsed[default_conf][0][1][0]
-        del self.config.parser.parsed[default_conf][0][1][0]
-        del self.config.parser.parsed[foo_conf][2][1][0][1][0]
+        self._remove_default_conf_listens()
+        del self._foo_conf_server()[0]
         self.config.version = (1, 3, 1)
 
         with pytest.raises(errors.MisconfigurationError):
-            self.config.deploy_cert("www.nomatch.com", "example/cert.pem", "example/key.pem",
-            "example/chain.pem", "example/fullchain.pem")
+            self.config.deploy_cert("www.nomatch.com", *_CERT_PATHS)
 
     def test_deploy_no_match_fail_multiple_defaults(self):
         self.config.version = (1, 3, 1)
         with pytest.raises(errors.MisconfigurationError):
-            self.config.deploy_cert("www.nomatch.com", "example/cert.pem", "example/key.pem",
-            "example/chain.pem", "example/fullchain.pem")
+            self.config.deploy_cert("www.nomatch.com", *_CERT_PATHS)
 
     def test_deploy_no_match_multiple_defaults_ok(self):
-        foo_conf = self.config.parser.abs_path('foo.conf')
-        self.config.parser.parsed[foo_conf][2][1][0][1][0][1] = '*:5001'
+        self._foo_conf_server()[0][1] = '*:5001'
         self.config.version = (1, 3, 1)
-        self.config.deploy_cert("www.nomatch.com", "example/cert.pem", "example/key.pem",
-            "example/chain.pem", "example/fullchain.pem")
+        self.config.deploy_cert("www.nomatch.com", *_CERT_PATHS)
 
     def test_deploy_no_match_add_redirect(self):
         default_conf = self.config.parser.abs_path('sites-enabled/default')
-        foo_conf = self.config.parser.abs_path('foo.conf')
-        del self.config.parser.parsed[foo_conf][2][1][0][1][0] # remove default_server
+        del self._foo_conf_server()[0] # remove default_server
         self.config.version = (1, 3, 1)
 
-        self.config.deploy_cert(
-            "www.nomatch.com",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            "example/fullchain.pem")
-
-        self.config.deploy_cert(
-            "nomatch.com",
-            "example/cert.pem",
-            "example/key.pem",
-            "example/chain.pem",
-            "example/fullchain.pem")
+        self.config.deploy_cert("www.nomatch.com", *_CERT_PATHS)
+        self.config.deploy_cert("nomatch.com", *_CERT_PATHS)
 
         self.config.enhance("www.nomatch.com", "redirect")
 
-        self.config.save()
-
-        self.config.parser.load()
-
-        expected = UnspacedList(_redirect_block_for_domain("www.nomatch.com"))[0]
+        expected = _expected_redirect("www.nomatch.com")
 
         generated_conf = self.config.parser.parsed[default_conf]
         assert util.contains_at_depth(generated_conf, expected, 2)
@@ -897,8 +917,7 @@ class NginxConfiguratorTest(util.NginxTest):
         # pylint: disable=protected-access
         mock_path = "certbot_nginx._internal.display_ops.select_vhost_multiple"
         with mock.patch(mock_path) as mock_select_vhs:
-            vhost = [x for x in self.config.parser.get_vhosts()
-              if 'summer.com' in x.names][0]
+            vhost = self._vhost('summer.com')
             mock_select_vhs.return_value = [vhost]
             vhs = self.config._choose_vhosts_wildcard("*.com",
                                                      prefer_ssl=True)
@@ -913,8 +932,7 @@ class NginxConfiguratorTest(util.NginxTest):
         # pylint: disable=protected-access
         mock_path = "certbot_nginx._internal.display_ops.select_vhost_multiple"
         with mock.patch(mock_path) as mock_select_vhs:
-            vhost = [x for x in self.config.parser.get_vhosts()
-              if 'summer.com' in x.names][0]
+            vhost = self._vhost('summer.com')
             mock_select_vhs.return_value = [vhost]
             vhs = self.config._choose_vhosts_wildcard("*.com",
                                                      prefer_ssl=False)
@@ -928,8 +946,7 @@ class NginxConfiguratorTest(util.NginxTest):
     def test_deploy_cert_wildcard(self):
         # pylint: disable=protected-access
         mock_choose_vhosts = mock.MagicMock()
-        vhost = [x for x in self.config.parser.get_vhosts()
-            if 'geese.com' in x.names][0]
+        vhost = self._vhost('geese.com')
         mock_choose_vhosts.return_value = [vhost]
         self.config._choose_vhosts_wildcard = mock_choose_vhosts
         mock_d = "certbot_nginx._internal.configurator.NginxConfigurator._deploy_cert"
@@ -951,16 +968,14 @@ class NginxConfiguratorTest(util.NginxTest):
     @mock.patch("certbot_nginx._internal.display_ops.select_vhost_multiple")
     def test_enhance_wildcard_ocsp_after_install(self, mock_dialog):
         # pylint: disable=protected-access
-        vhost = [x for x in self.config.parser.get_vhosts()
-            if 'geese.com' in x.names][0]
+        vhost = self._vhost('geese.com')
         self.config._wildcard_vhosts["*.com"] = [vhost]
         self.config.enhance("*.com", "staple-ocsp", "example/chain.pem")
         assert not mock_dialog.called
 
     @mock.patch("certbot_nginx._internal.display_ops.select_vhost_multiple")
     def test_enhance_wildcard_redirect_or_ocsp_no_install(self, mock_dialog):
-        vhost = [x for x in self.config.parser.get_vhosts()
-            if 'summer.com' in x.names][0]
+        vhost = self._vhost('summer.com')
         mock_dialog.return_value = [vhost]
         self.config.enhance("*.com", "staple-ocsp", "example/chain.pem")
         assert mock_dialog.called is True
@@ -968,8 +983,7 @@ class NginxConfiguratorTest(util.NginxTest):
     @mock.patch("certbot_nginx._internal.display_ops.select_vhost_multiple")
     def test_enhance_wildcard_double_redirect(self, mock_dialog):
       # pylint: disable=protected-access
-        vhost = [x for x in self.config.parser.get_vhosts()
-            if 'summer.com' in x.names][0]
+        vhost = self._vhost('summer.com')
         self.config._wildcard_redirect_vhosts["*.com"] = [vhost]
         self.config.enhance("*.com", "redirect")
         assert not mock_dialog.called
@@ -985,34 +999,20 @@ class NginxConfiguratorTest(util.NginxTest):
             # Check that the dialog was called with only port 80 vhosts
             assert len(mock_select_vhs.call_args[0][0]) == 9
 
-    def test_choose_auth_vhosts(self):
-        """choose_auth_vhosts correctly selects duplicative and HTTP/HTTPS vhosts"""
-        http, https = self.config.choose_auth_vhosts('ssl.both.com')
-        assert len(http) == 4
-        assert len(https) == 2
-        assert http[0].names == {'ssl.both.com'}
-        assert http[1].names == {'ssl.both.com'}
-        assert http[2].names == {'ssl.both.com'}
-        assert http[3].names == {'*.both.com'}
-        assert https[0].names == {'ssl.both.com'}
-        assert https[1].names == {'*.both.com'}
 
-
-class InstallSslOptionsConfTest(util.NginxTest):
+class TestInstallSslOptionsConf:
     """Test that the options-ssl-nginx.conf file is installed and updated properly."""
 
-    def setUp(self):
-        super().setUp()
-
-        self.config = self.get_nginx_configurator(
-            self.config_path, self.config_dir, self.work_dir, self.logs_dir)
+    @pytest.fixture(autouse=True)
+    def _set_up(self, nginx_config):
+        self.config = nginx_config
 
     def _call(self):
         self.config.install_ssl_options_conf(self.config.mod_ssl_conf,
             self.config.updated_mod_ssl_conf_digest)
 
     def _current_ssl_options_hash(self):
-        return crypto_util.sha256sum(self.config.mod_ssl_conf_src)
+        return _packaged_file_sha256sum(self.config.mod_ssl_conf_src)
 
     def _assert_current_file(self):
         assert os.path.isfile(self.config.mod_ssl_conf)
@@ -1032,29 +1032,25 @@ class InstallSslOptionsConfTest(util.NginxTest):
         self._call()
         self._assert_current_file()
 
-    def _mock_hash_except_ssl_conf_src(self, fake_hash):
+    @pytest.fixture
+    def prev_file_hash(self):
+        """sha256sum replacement pretending the installed file is a previous version."""
         # Write a bad file in place so that update tests fail if no update occurs.
         # We're going to pretend this file (the currently installed conf file)
-        # actually hashes to `fake_hash` for the update tests.
+        # actually hashes to the first known hash for the update tests.
         with open(self.config.mod_ssl_conf, "w") as f:
             f.write("bogus")
         sha256 = crypto_util.sha256sum
         def _hash(filename):
-            return sha256(filename) if filename == self.config.mod_ssl_conf_src else fake_hash
+            if filename == self.config.mod_ssl_conf_src:
+                return sha256(filename)
+            return ALL_SSL_OPTIONS_HASHES[0]
         return _hash
 
-    def test_prev_file_updates_to_current(self):
-        from certbot_nginx._internal.constants import ALL_SSL_OPTIONS_HASHES
-        with mock.patch('certbot.crypto_util.sha256sum',
-                new=self._mock_hash_except_ssl_conf_src(ALL_SSL_OPTIONS_HASHES[0])):
-            self._call()
-        self._assert_current_file()
-
-    def test_prev_file_updates_to_current_old_nginx(self):
-        from certbot_nginx._internal.constants import ALL_SSL_OPTIONS_HASHES
-        self.config.version = (1, 5, 8)
-        with mock.patch('certbot.crypto_util.sha256sum',
-                new=self._mock_hash_except_ssl_conf_src(ALL_SSL_OPTIONS_HASHES[0])):
+    @pytest.mark.parametrize("version", [(1, 6, 2), (1, 5, 8)])
+    def test_prev_file_updates_to_current(self, version, prev_file_hash):
+        self.config.version = version
+        with mock.patch('certbot.crypto_util.sha256sum', new=prev_file_hash):
             self._call()
         self._assert_current_file()
 
@@ -1088,7 +1084,6 @@ class InstallSslOptionsConfTest(util.NginxTest):
             assert not mock_logger.warning.called
 
     def test_current_file_hash_in_all_hashes(self):
-        from certbot_nginx._internal.constants import ALL_SSL_OPTIONS_HASHES
         assert self._current_ssl_options_hash() in ALL_SSL_OPTIONS_HASHES, \
             "Constants.ALL_SSL_OPTIONS_HASHES must be appended" \
             " with the sha256 hash of self.config.mod_ssl_conf when it is updated."
@@ -1100,41 +1095,28 @@ class InstallSslOptionsConfTest(util.NginxTest):
         file has been manually edited by the user, and will refuse to update it.
         This test ensures that all necessary hashes are present.
         """
-        import importlib.resources
-
-        from certbot_nginx._internal.constants import ALL_SSL_OPTIONS_HASHES
-
         tls_configs_ref = importlib.resources.files("certbot_nginx").joinpath(
             "_internal", "tls_configs")
         with importlib.resources.as_file(tls_configs_ref) as tls_configs_dir:
             for tls_config_file in os.listdir(tls_configs_dir):
-                file_hash = crypto_util.sha256sum(os.path.join(tls_configs_dir, tls_config_file))
+                file_hash = _packaged_file_sha256sum(
+                    os.path.join(tls_configs_dir, tls_config_file))
                 assert file_hash in ALL_SSL_OPTIONS_HASHES, \
                     f"Constants.ALL_SSL_OPTIONS_HASHES must be appended with the sha256 " \
                     f"hash of {tls_config_file} when it is updated."
 
-    def test_nginx_version_uses_correct_config(self):
-        self.config.version = (1, 5, 8)
-        self.config.openssl_version = "1.0.2g" # shouldn't matter
-        assert os.path.basename(self.config.mod_ssl_conf_src) == \
-                         "options-ssl-nginx-old.conf"
-        self._call()
-        self._assert_current_file()
-        self.config.version = (1, 5, 9)
-        self.config.openssl_version = "1.0.2l"
-        assert os.path.basename(self.config.mod_ssl_conf_src) == \
-                         "options-ssl-nginx-tls12-only.conf"
-        self._call()
-        self._assert_current_file()
-        self.config.version = (1, 13, 0)
-        assert os.path.basename(self.config.mod_ssl_conf_src) == \
-                         "options-ssl-nginx.conf"
+    @pytest.mark.parametrize("version,openssl_version,basename", [
+        ((1, 5, 8), "1.0.2g", "options-ssl-nginx-old.conf"),  # OpenSSL shouldn't matter
+        ((1, 5, 9), "1.0.2l", "options-ssl-nginx-tls12-only.conf"),
+        ((1, 13, 0), "1.0.2l", "options-ssl-nginx.conf"),
+        ((1, 13, 0), "1.0.2k", "options-ssl-nginx-tls13-session-tix-on.conf"),
+    ])
+    def test_nginx_version_uses_correct_config(self, version, openssl_version, basename):
+        self.config.version = version
+        self.config.openssl_version = openssl_version
+        assert os.path.basename(self.config.mod_ssl_conf_src) == basename
         self._call()
         self._assert_current_file()
-        self.config.version = (1, 13, 0)
-        self.config.openssl_version = "1.0.2k"
-        assert os.path.basename(self.config.mod_ssl_conf_src) == \
-                         "options-ssl-nginx-tls13-session-tix-on.conf"
 
 
 class DetermineDefaultServerRootTest(certbot_test_util.ConfigTestCase):
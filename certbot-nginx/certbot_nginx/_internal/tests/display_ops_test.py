@@ -11,7 +11,7 @@ from certbot_nginx._internal.display_ops import select_vhost_multiple
 from certbot_nginx._internal.tests import test_util as util
 
 
-class SelectVhostMultiTest(util.NginxTest):
+class SelectVhostMultiTest(util.NginxReadOnlyTest):
     """Tests for certbot_nginx._internal.display_ops.select_vhost_multiple."""
 
     def setUp(self):
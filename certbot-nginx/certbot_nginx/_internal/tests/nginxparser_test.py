@@ -388,6 +388,14 @@ class TestUnspacedList(unittest.TestCase):
     def test_construction(self):
         assert self.ul == ["things", "quirk"]
         assert self.ul2 == ["y"]
+        assert UnspacedList(iter(self.a)) == ["things", "quirk"]
+
+    def test_construction_copies_sublists(self):
+        source = [['listen', ' ', '80'], '\n']
+        ul3 = UnspacedList(source)
+        ul3[0].append('ssl')
+        assert ul3.spaced == [['listen', ' ', '80', 'ssl'], '\n']
+        assert source == [['listen', ' ', '80'], '\n']
 
     def test_append(self):
         ul3 = copy.deepcopy(self.ul)
@@ -1,6 +1,8 @@
 """Common utilities for certbot_nginx."""
 from contextlib import contextmanager
+from contextlib import ExitStack
 import copy
+import functools
 import importlib.resources
 import shutil
 import sys
@@ -10,6 +12,7 @@ from unittest import mock
 import josepy as jose
 
 from certbot import util
+from certbot.compat import filesystem
 from certbot.compat import os
 from certbot.plugins import common
 from certbot.tests import util as test_util
@@ -19,21 +22,20 @@ from certbot_nginx._internal import nginxparser
 
 class NginxTest(test_util.ConfigTestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.rsa512jwk = _rsa512_jwk()
+
     def setUp(self):
         super().setUp()
 
         self.configuration = self.config
         self.config = None
 
-        self.temp_dir, self.config_dir, self.work_dir = common.dir_setup(
-            "etc_nginx", __package__)
+        self._set_up_dirs()
         self.logs_dir = tempfile.mkdtemp('logs')
 
-        self.config_path = os.path.join(self.temp_dir, "etc_nginx")
-
-        self.rsa512jwk = jose.JWKRSA.load(test_util.load_vector(
-            "rsa512_key.pem"))
-
     def tearDown(self):
         # Cleanup opened resources after a test. This is usually done through atexit handlers in
         # Certbot, but during tests, atexit will not run registered functions before tearDown is
@@ -46,38 +48,102 @@ class NginxTest(test_util.ConfigTestCase):
         shutil.rmtree(self.work_dir)
         shutil.rmtree(self.logs_dir)
 
+    def _set_up_dirs(self):
+        """Create the temporary directories and a copy of the test configuration."""
+        self.temp_dir, self.config_dir, self.work_dir = common.dir_setup(
+            "etc_nginx", __package__)
+        self.config_path = os.path.join(self.temp_dir, "etc_nginx")
+
     def get_nginx_configurator(self, config_path, config_dir, work_dir, logs_dir,
             version=(1, 6, 2), openssl_version="1.0.2g"):
         """Create an Nginx Configurator with the specified options."""
+        return make_nginx_configurator(self.configuration, config_path, config_dir,
+                                       work_dir, logs_dir, version, openssl_version)
+
+
+class NginxReadOnlyTest(NginxTest):
+    """NginxTest using the packaged test configuration in place.
+
+    The configuration is not copied to a temporary directory, so the tests
+    must never save it.
+    """
+
+    def setUp(self):
+        self._resources = ExitStack()
+        super().setUp()
 
-        backups = os.path.join(work_dir, "backups")
-
-        self.configuration.nginx_server_root = config_path
-        self.configuration.nginx_sleep_seconds = 0.1234
-        self.configuration.le_vhost_ext = "-le-ssl.conf"
-        self.configuration.config_dir = config_dir
-        self.configuration.work_dir = work_dir
-        self.configuration.logs_dir = logs_dir
-        self.configuration.backup_dir = backups
-        self.configuration.temp_checkpoint_dir = os.path.join(work_dir, "temp_checkpoints")
-        self.configuration.in_progress_dir = os.path.join(backups, "IN_PROGRESS")
-        self.configuration.server = "https://acme-server.org:443/new"
-        self.configuration.http01_port = 80
-        self.configuration.https_port = 5001
-
-        with mock.patch("certbot_nginx._internal.configurator.NginxConfigurator."
-                        "config_test"):
-            with mock.patch("certbot_nginx._internal.configurator.util."
-                            "exe_exists") as mock_exe_exists:
+    def tearDown(self):
+        super().tearDown()
+        self._resources.close()
+
+    def _set_up_dirs(self):
+        self.temp_dir = filesystem.realpath(tempfile.mkdtemp("temp"))
+        self.config_dir = filesystem.realpath(tempfile.mkdtemp("config"))
+        self.work_dir = filesystem.realpath(tempfile.mkdtemp("work"))
+        ref = importlib.resources.files(__package__) / "testdata" / "etc_nginx"
+        self.config_path = filesystem.realpath(
+            str(self._resources.enter_context(importlib.resources.as_file(ref))))
+
+    def get_nginx_configurator(self, *args, **kwargs):
+        # prepare() locks the server root by creating a file in it
+        with mock.patch("certbot_nginx._internal.configurator.util.lock_dir_until_exit"):
+            return super().get_nginx_configurator(*args, **kwargs)
+
+
+def make_nginx_configurator(configuration, config_path, config_dir, work_dir, logs_dir,
+        version=(1, 6, 2), openssl_version="1.0.2g"):
+    """Create an Nginx Configurator using configuration with the specified options."""
+
+    backups = os.path.join(work_dir, "backups")
+
+    configuration.nginx_server_root = config_path
+    configuration.nginx_sleep_seconds = 0.1234
+    configuration.le_vhost_ext = "-le-ssl.conf"
+    configuration.config_dir = config_dir
+    configuration.work_dir = work_dir
+    configuration.logs_dir = logs_dir
+    configuration.backup_dir = backups
+    configuration.temp_checkpoint_dir = os.path.join(work_dir, "temp_checkpoints")
+    configuration.in_progress_dir = os.path.join(backups, "IN_PROGRESS")
+    configuration.server = "https://acme-server.org:443/new"
+    configuration.http01_port = 80
+    configuration.https_port = 5001
+
+    with mock.patch("certbot_nginx._internal.configurator.NginxConfigurator."
+                    "config_test"):
+        with mock.patch("certbot_nginx._internal.configurator.util."
+                        "exe_exists") as mock_exe_exists:
+            with mock.patch("certbot_nginx._internal.parser.nginxparser.load",
+                            new=_cached_load):
                 mock_exe_exists.return_value = True
                 config = configurator.NginxConfigurator(
-                    self.configuration,
+                    configuration,
                     name="nginx",
                     version=version,
                     openssl_version=openssl_version)
                 config.prepare()
 
-        return config
+    return config
+
+
+@functools.lru_cache(maxsize=None)
+def _rsa512_jwk():
+    return jose.JWKRSA.load(test_util.load_vector("rsa512_key.pem"))
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_source(source):
+    return nginxparser.RawNginxParser(source).as_list()
+
+
+def _cached_load(file_):
+    """Drop-in replacement for nginxparser.load parsing each distinct source only once.
+
+    The same test configuration is loaded for almost every test, and parsing it
+    dominates the cost of creating a configurator. UnspacedList copies the lists
+    it is built from, so the cached result is never modified.
+    """
+    return nginxparser.UnspacedList(_parse_source(file_.read()))
 
 
 @contextmanager
@@ -39,13 +39,13 @@ _WEB_CONFIG_CONTENT = """\
   </system.webServer>
 </configuration>
 """
-# This list references the hashes of all versions of the web.config files that Certbot could
+# This set references the hashes of all versions of the web.config files that Certbot could
 # have generated during an HTTP-01 challenge. If you modify _WEB_CONFIG_CONTENT, you MUST add
-# the new hash in this list.
-_WEB_CONFIG_SHA256SUMS = [
+# the new hash in this set.
+_WEB_CONFIG_SHA256SUMS = frozenset({
     "20c5ca1bd58fa8ad5f07a2f1be8b7cbb707c20fcb607a8fc8db9393952846a97",
-    "8d31383d3a079d2098a9d0c0921f4ab87e708b9868dc3f314d54094c2fe70336"
-]
+    "8d31383d3a079d2098a9d0c0921f4ab87e708b9868dc3f314d54094c2fe70336",
+})
 
 
 class Authenticator(common.Plugin, interfaces.Authenticator):
@@ -108,19 +108,23 @@ to serve all files under specified web root ({0})."""
 
         self._create_challenge_dirs()
 
-        return [self._perform_single(achall) for achall in achalls]
+        # Change permissions to be world-readable, owner-writable (GH #1795)
+        with filesystem.temp_umask(0o022):
+            return [self._perform_single(achall) for achall in achalls]
 
     def _set_webroots(self, achalls: Iterable[AnnotatedChallenge]) -> None:
-        if self.conf("path"):
-            webroot_path = self.conf("path")[-1]
+        webroot_map = self.conf("map")
+        webroot_paths = self.conf("path")
+        if webroot_paths:
+            webroot_path = webroot_paths[-1]
             logger.info("Using the webroot path %s for all unmatched domains.",
                         webroot_path)
             for achall in achalls:
-                self.conf("map").setdefault(achall.domain, webroot_path)
+                webroot_map.setdefault(achall.domain, webroot_path)
         else:
-            known_webroots = list(set(self.conf("map").values()))
+            known_webroots = list(set(webroot_map.values()))
             for achall in achalls:
-                if achall.domain not in self.conf("map"):
+                if achall.domain not in webroot_map:
                     new_webroot = self._prompt_for_webroot(achall.domain,
                                                            known_webroots)
                     # Put the most recently input
@@ -130,7 +134,7 @@ to serve all files under specified web root ({0})."""
                     except ValueError:
                         pass
                     known_webroots.insert(0, new_webroot)
-                    self.conf("map")[achall.domain] = new_webroot
+                    webroot_map[achall.domain] = new_webroot
 
     def _prompt_for_webroot(self, domain: str, known_webroots: list[str]) -> Optional[str]:
         webroot = None
@@ -182,9 +186,16 @@ to serve all files under specified web root ({0})."""
                 "Missing parts of webroot configuration; please set either "
                 "--webroot-path and --domains, or --webroot-map. Run with "
                 " --help webroot for examples.")
+        # directories known to exist, shared by webroots with common parents
+        existing_dirs: set[str] = set()
+        # webroots already set up in this call, mapped to their challenge dir
+        prepared_roots: dict[str, str] = {}
+        uri_root_path = os.path.normcase(challenges.HTTP01.URI_ROOT_PATH)
         for name, path in path_map.items():
-            self.full_roots[name] = os.path.join(path, os.path.normcase(
-                challenges.HTTP01.URI_ROOT_PATH))
+            if path in prepared_roots:
+                self.full_roots[name] = prepared_roots[path]
+                continue
+            self.full_roots[name] = os.path.join(path, uri_root_path)
             logger.debug("Creating root challenges validation dir at %s",
                          self.full_roots[name])
 
@@ -193,11 +204,17 @@ to serve all files under specified web root ({0})."""
             # run as non-root (GH #1795)
             with filesystem.temp_umask(0o022):
                 # We ignore the last prefix in the next iteration,
-                # as it does not correspond to a folder path ('/' or 'C:')
-                for prefix in sorted(util.get_prefixes(self.full_roots[name])[:-1], key=len):
-                    if os.path.isdir(prefix):
+                # as it does not correspond to a folder path ('/' or 'C:').
+                # get_prefixes() returns longest first, so walk it backwards.
+                created_parent = False
+                for prefix in reversed(util.get_prefixes(self.full_roots[name])[:-1]):
+                    if prefix in existing_dirs:
+                        continue
+                    # A directory we have just created cannot have children yet
+                    if not created_parent and os.path.isdir(prefix):
                         # Don't try to create directory if it already exists, as some filesystems
                         # won't reliably raise EEXIST or EISDIR if directory exists.
+                        existing_dirs.add(prefix)
                         continue
                     try:
                         # Set owner as parent directory if possible, apply mode for Linux/Windows.
@@ -206,6 +223,8 @@ to serve all files under specified web root ({0})."""
                         # https://docs.python.org/3/library/os.html#os.mkdir
                         filesystem.mkdir(prefix, 0o755)
                         self._created_dirs.append(prefix)
+                        existing_dirs.add(prefix)
+                        created_parent = True
                         try:
                             filesystem.copy_ownership_and_apply_mode(
                                 path, prefix, 0o755, copy_user=True, copy_group=True)
@@ -217,6 +236,8 @@ to serve all files under specified web root ({0})."""
                             "Couldn't create root for {0} http-01 "
                             "challenge responses: {1}".format(name, exception))
 
+            prepared_roots[path] = self.full_roots[name]
+
             # On Windows, generate a local web.config file that allows IIS to serve expose
             # challenge files despite the fact they do not have a file extension.
             if not filesystem.POSIX_MODE:
@@ -240,15 +261,15 @@ to serve all files under specified web root ({0})."""
         validation_path = self._get_validation_path(root_path, achall)
         logger.debug("Attempting to save validation to %s", validation_path)
 
-        # Change permissions to be world-readable, owner-writable (GH #1795)
-        with filesystem.temp_umask(0o022):
-            with safe_open(validation_path, mode="wb", chmod=0o644) as validation_file:
-                validation_file.write(validation.encode())
+        with safe_open(validation_path, mode="wb", chmod=0o644) as validation_file:
+            validation_file.write(validation.encode())
 
         self.performed[root_path].add(achall)
         return response
 
     def cleanup(self, achalls: list[AnnotatedChallenge]) -> None:  # pylint: disable=missing-function-docstring
+        # roots whose web.config has already been handled during this cleanup
+        cleaned_roots: set[str] = set()
         for achall in achalls:
             root_path = self.full_roots.get(achall.domain, None)
             if root_path is not None:
@@ -257,7 +278,8 @@ to serve all files under specified web root ({0})."""
                 os.remove(validation_path)
                 self.performed[root_path].remove(achall)
 
-                if not filesystem.POSIX_MODE:
+                if not filesystem.POSIX_MODE and root_path not in cleaned_roots:
+                    cleaned_roots.add(root_path)
                     web_config_path = os.path.join(root_path, "web.config")
                     if os.path.exists(web_config_path):
                         sha256sum = crypto_util.sha256sum(web_config_path)
@@ -275,9 +297,11 @@ to serve all files under specified web root ({0})."""
             try:
                 os.rmdir(path)
             except OSError as exc:
-                not_removed.insert(0, path)
+                not_removed.append(path)
                 logger.info("Challenge directory %s was not empty, didn't remove", path)
                 logger.debug("Error was: %s", exc)
+        # popped deepest first; restore creation order for the next cleanup
+        not_removed.reverse()
         self._created_dirs = not_removed
         logger.debug("All challenges cleaned up")
 
@@ -290,8 +314,12 @@ class _WebrootMapAction(argparse.Action):
                  option_string: Optional[str] = None) -> None:
         if webroot_map is None:
             return
+        # many domain groups usually share a few webroots; validate each only once
+        validated: dict[str, str] = {}
         for domains, webroot_path in json.loads(str(webroot_map)).items():
-            webroot_path = _validate_webroot(webroot_path)
+            if webroot_path not in validated:
+                validated[webroot_path] = _validate_webroot(webroot_path)
+            webroot_path = validated[webroot_path]
             namespace.webroot_map.update(
                 (d, webroot_path) for d in cli.add_domains(namespace, domains))
 
@@ -275,6 +275,16 @@ class WindowsOpenTest(TempDirTestCase):
         with pytest.raises(OSError):
             self._test_one_creation(6, file_exist=False, flags=os.O_RDONLY)
 
+    def test_create_flags_removed_after_creation(self):
+        import os as std_os  # pylint: disable=os-module-forbidden
+        path = os.path.join(self.tempdir, 'file')
+
+        with mock.patch('certbot.compat.filesystem.os.open', wraps=std_os.open) as mock_open:
+            os.close(filesystem.open(path, os.O_CREAT | os.O_WRONLY))
+
+        # os.O_EXCL was not requested, so it must not be added when os.O_CREAT is removed
+        mock_open.assert_called_once_with(path, os.O_WRONLY)
+
     def _test_one_creation(self, num, file_exist, flags):
         one_file = os.path.join(self.tempdir, str(num))
         if file_exist and not os.path.exists(one_file):
@@ -469,6 +479,17 @@ class CheckPermissionsTest(test_util.TempDirTestCase):
             mock_get.return_value = security
             assert not filesystem.check_owner(self.probe_path)
 
+    @unittest.skipIf(POSIX_MODE, reason='Test specific to Windows security')
+    def test_current_user_looked_up_once(self):
+        filesystem._get_current_user.cache_clear()
+
+        with mock.patch('win32security.LookupAccountName',
+                        wraps=win32security.LookupAccountName) as mock_lookup:
+            assert filesystem.check_owner(self.probe_path) is True
+            assert filesystem.check_owner(self.probe_path) is True
+
+        mock_lookup.assert_called_once()
+
     @unittest.skipUnless(POSIX_MODE, reason='Test specific to Linux security')
     def test_check_owner_linux(self):
         assert filesystem.check_owner(self.probe_path) is True
@@ -486,14 +507,34 @@ class CheckPermissionsTest(test_util.TempDirTestCase):
     def test_check_permissions(self):
         assert filesystem.check_permissions(self.probe_path, 0o744) is True
 
-        with mock.patch('certbot.compat.filesystem.check_mode') as mock_mode:
-            mock_mode.return_value = False
+        filesystem.chmod(self.probe_path, 0o700)
+        assert not filesystem.check_permissions(self.probe_path, 0o744)
+
+    @unittest.skipIf(POSIX_MODE, reason='Test specific to Windows security')
+    def test_check_permissions_owner_windows(self):
+        system = win32security.ConvertStringSidToSid(SYSTEM_SID)
+
+        with mock.patch('certbot.compat.filesystem._get_current_user') as mock_user:
+            mock_user.return_value = system
             assert not filesystem.check_permissions(self.probe_path, 0o744)
 
-        with mock.patch('certbot.compat.filesystem.check_owner') as mock_owner:
-            mock_owner.return_value = False
+    @unittest.skipUnless(POSIX_MODE, reason='Test specific to Linux security')
+    def test_check_permissions_owner_linux(self):
+        import os as std_os  # pylint: disable=os-module-forbidden
+        uid = std_os.getuid()
+
+        with mock.patch('os.getuid') as mock_uid:
+            mock_uid.return_value = uid + 1
             assert not filesystem.check_permissions(self.probe_path, 0o744)
 
+    @unittest.skipUnless(POSIX_MODE, reason='Test specific to Linux security')
+    def test_check_permissions_single_stat(self):
+        import os as std_os  # pylint: disable=os-module-forbidden
+
+        with mock.patch('certbot.compat.filesystem.os.stat', wraps=std_os.stat) as mock_stat:
+            assert filesystem.check_permissions(self.probe_path, 0o744) is True
+        mock_stat.assert_called_once_with(self.probe_path)
+
     def test_check_min_permissions(self):
         filesystem.chmod(self.probe_path, 0o744)
         assert filesystem.has_min_permissions(self.probe_path, 0o744) is True
@@ -557,6 +598,16 @@ class RealpathTest(test_util.TempDirTestCase):
         finally:
             os.chdir(curdir)
 
+    def test_resolve_link(self):
+        self.probe_path = filesystem.realpath(self.probe_path)
+        link_path = os.path.join(self.tempdir, 'link')
+        os.symlink(self.probe_path, link_path)
+
+        assert self.probe_path == filesystem._resolve_link(link_path)
+        with mock.patch('certbot.compat.filesystem.realpath') as mock_realpath:
+            assert self.probe_path == filesystem._resolve_link(self.probe_path)
+        mock_realpath.assert_not_called()
+
     def test_symlink_loop_mitigation(self):
         link1_path = os.path.join(self.tempdir, 'link1')
         link2_path = os.path.join(self.tempdir, 'link2')
@@ -590,7 +641,9 @@ class IsExecutableTest(test_util.TempDirTestCase):
                 dacl.DeleteAce(1)  # DeleteAce dynamically updates the internal index mapping.
             return dacl
 
-        # create a non-executable file
+        # create a non-executable file, without reusing or keeping cached security attributes
+        filesystem._generate_security_attributes.cache_clear()
+        self.addCleanup(filesystem._generate_security_attributes.cache_clear)
         with mock.patch("certbot.compat.filesystem._generate_dacl", side_effect=_execute_mock):
             os.close(filesystem.open(file_path, os.O_CREAT | os.O_WRONLY, 0o666))
 
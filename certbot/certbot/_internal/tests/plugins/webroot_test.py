@@ -20,6 +20,7 @@ from certbot import errors
 from certbot.compat import filesystem
 from certbot.compat import os
 from certbot.display import util as display_util
+from certbot.plugins import util as plugins_util
 from certbot.tests import acme_util
 from certbot.tests import util as test_util
 
@@ -131,6 +132,24 @@ class AuthenticatorTest(unittest.TestCase):
             file.write("something")
         self.auth.perform([self.achall, achall_2])
 
+    def test_foreign_webconfig_hashed_once_per_root(self):
+        achall_2 = achallenges.KeyAuthorizationAnnotatedChallenge(
+            challb=acme_util.chall_to_challb(challenges.HTTP01(token=b"bingo"), "pending"),
+            domain="second-thing.com", account_key=KEY)
+        self.config.webroot_map["second-thing.com"] = self.path
+        self.auth.perform([self.achall, achall_2])
+
+        webconfig_path = os.path.join(self.root_challenge_path, "web.config")
+        with open(webconfig_path, "w") as file:
+            file.write("something")
+        with mock.patch("certbot._internal.plugins.webroot.filesystem.POSIX_MODE", False):
+            with mock.patch("certbot._internal.plugins.webroot.crypto_util.sha256sum",
+                            return_value="foreign") as mock_sha256sum:
+                self.auth.cleanup([self.achall, achall_2])
+
+        mock_sha256sum.assert_called_once_with(webconfig_path)
+        assert os.path.exists(webconfig_path)
+
     @test_util.patch_display_util()
     def test_webroot_from_list_help_and_cancel(self, mock_get_utility):
         self.config.webroot_path = []
@@ -216,6 +235,42 @@ class AuthenticatorTest(unittest.TestCase):
             self.auth.perform([achall])
         assert self.config.webroot_map[achall.domain] == new_webroot
 
+    def test_perform_shared_webroot_checks_dirs_once(self):
+        achall_2 = achallenges.KeyAuthorizationAnnotatedChallenge(
+            challb=acme_util.chall_to_challb(challenges.HTTP01(token=b"bingo"), "pending"),
+            domain="second-thing.com", account_key=KEY)
+        self.config.webroot_map["second-thing.com"] = self.path
+
+        with mock.patch("certbot.compat.os.path.isdir", wraps=os.path.isdir) as mock_isdir:
+            self.auth.perform([self.achall, achall_2])
+
+        checked = [call[0][0] for call in mock_isdir.call_args_list]
+        assert len(checked) == len(set(checked))
+        assert os.path.isdir(self.root_challenge_path)
+
+    def test_perform_shared_webroot_prepared_once(self):
+        achall_2 = achallenges.KeyAuthorizationAnnotatedChallenge(
+            challb=acme_util.chall_to_challb(challenges.HTTP01(token=b"bingo"), "pending"),
+            domain="second-thing.com", account_key=KEY)
+        self.config.webroot_map["second-thing.com"] = self.path
+
+        with mock.patch("certbot._internal.plugins.webroot.util.get_prefixes",
+                        wraps=plugins_util.get_prefixes) as mock_get_prefixes:
+            self.auth.perform([self.achall, achall_2])
+
+        mock_get_prefixes.assert_called_once_with(self.root_challenge_path)
+        assert self.auth.full_roots == dict.fromkeys(
+            ("thing.com", "second-thing.com"), self.root_challenge_path)
+
+    def test_perform_skips_isdir_below_created_dir(self):
+        with mock.patch("certbot.compat.os.path.isdir", wraps=os.path.isdir) as mock_isdir:
+            self.auth.perform([self.achall])
+
+        checked = [call[0][0] for call in mock_isdir.call_args_list]
+        assert self.partial_root_challenge_path in checked
+        assert self.root_challenge_path not in checked
+        assert os.path.isdir(self.root_challenge_path)
+
     def test_perform_permissions(self):
         self.auth.prepare()
 
@@ -293,6 +348,7 @@ class AuthenticatorTest(unittest.TestCase):
     def test_cleanup_failure(self, mock_rmdir):
         self.auth.prepare()
         self.auth.perform([self.achall])
+        created_dirs = list(self.auth._created_dirs)
 
         os_error = OSError()
         os_error.errno = errno.EACCES
@@ -301,6 +357,7 @@ class AuthenticatorTest(unittest.TestCase):
         self.auth.cleanup([self.achall])
         assert not os.path.exists(self.validation_path)
         assert os.path.exists(self.root_challenge_path)
+        assert self.auth._created_dirs == created_dirs
 
 
 class WebrootActionTest(unittest.TestCase):
@@ -322,6 +379,15 @@ class WebrootActionTest(unittest.TestCase):
             ["--webroot-map", json.dumps({'thing.com': self.path})])
         assert args.webroot_map["thing.com"] == self.path
 
+    def test_webroot_map_action_shared_webroot(self):
+        webroot_map = {'thing.com': self.path, 'other.com,m.other.com': self.path}
+        with mock.patch("certbot._internal.plugins.webroot._validate_webroot",
+                        side_effect=os.path.abspath) as mock_validate:
+            args = self.parser.parse_args(["--webroot-map", json.dumps(webroot_map)])
+        mock_validate.assert_called_once_with(self.path)
+        assert args.webroot_map == dict.fromkeys(
+            ("thing.com", "other.com", "m.other.com"), self.path)
+
     def test_domain_before_webroot(self):
         args = self.parser.parse_args(
             "-d {0} -w {1}".format(self.achall.domain, self.path).split())
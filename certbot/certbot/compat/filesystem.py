@@ -4,6 +4,7 @@ from __future__ import absolute_import
 from collections.abc import Generator
 from contextlib import contextmanager
 import errno
+import functools
 import os  # pylint: disable=os-module-forbidden
 import stat
 from typing import Any
@@ -21,6 +22,12 @@ except ImportError:
     POSIX_MODE = True
 else:
     POSIX_MODE = False
+    # Standard accounts from "well-known" sid
+    # See the list here:
+    # https://support.microsoft.com/en-us/help/243330/well-known-security-identifiers-in-windows-operating-systems
+    _SYSTEM_SID = win32security.ConvertStringSidToSid('S-1-5-18')
+    _ADMINS_SID = win32security.ConvertStringSidToSid('S-1-5-32-544')
+    _EVERYONE_SID = win32security.ConvertStringSidToSid('S-1-1-0')
 
 
 # Windows umask implementation, since Windows does not have a concept of umask by default.
@@ -30,6 +37,8 @@ else:
 # that could happen with this kind of pattern.
 class _WindowsUmask:
     """Store the current umask to apply on Windows"""
+    __slots__ = ('mask',)
+
     def __init__(self) -> None:
         self.mask = 0o022
 
@@ -204,7 +213,17 @@ def check_permissions(file_path: str, mode: int) -> bool:
     :rtype: bool
     :return: True if file has correct mode and owner, False otherwise.
     """
-    return check_owner(file_path) and check_mode(file_path, mode)
+    # Both checks are answered from a single stat or security descriptor lookup.
+    if POSIX_MODE:
+        stats = os.stat(file_path)
+        return stats.st_uid == os.getuid() and stat.S_IMODE(stats.st_mode) == mode
+
+    # Resolve symbolic links
+    file_path = _resolve_link(file_path)
+    security = win32security.GetFileSecurity(file_path, win32security.OWNER_SECURITY_INFORMATION
+                                             | win32security.DACL_SECURITY_INFORMATION)
+    return (_get_current_user() == security.GetSecurityDescriptorOwner()
+            and _check_win_security_mode(security, mode))
 
 
 def open(file_path: str, flags: int, mode: int = 0o777) -> int:  # pylint: disable=redefined-builtin
@@ -233,25 +252,14 @@ def open(file_path: str, flags: int, mode: int = 0o777) -> int:  # pylint: disab
         # "CREATE_ALWAYS" that will always create the file whether it exists or not.
         disposition = win32con.CREATE_NEW if flags & os.O_EXCL else win32con.CREATE_ALWAYS
 
-        attributes = win32security.SECURITY_ATTRIBUTES()
-        security = attributes.SECURITY_DESCRIPTOR
-        user = _get_current_user()
-        dacl = _generate_dacl(user, mode, _WINDOWS_UMASK.mask)
-        # We set second parameter to 0 (`False`) to say that this security descriptor is
-        # NOT constructed from a default mechanism, but is explicitly set by the user.
-        # See https://docs.microsoft.com/en-us/windows/desktop/api/securitybaseapi/nf-securitybaseapi-setsecuritydescriptorowner  # pylint: disable=line-too-long
-        security.SetSecurityDescriptorOwner(user, 0)
-        # We set first parameter to 1 (`True`) to say that this security descriptor contains
-        # a DACL. Otherwise second and third parameters are ignored.
-        # We set third parameter to 0 (`False`) to say that this security descriptor is
-        # NOT constructed from a default mechanism, but is explicitly set by the user.
-        # See https://docs.microsoft.com/en-us/windows/desktop/api/securitybaseapi/nf-securitybaseapi-setsecuritydescriptordacl  # pylint: disable=line-too-long
-        security.SetSecurityDescriptorDacl(1, dacl, 0)
+        attributes = _generate_security_attributes(mode, _WINDOWS_UMASK.mask)
 
         handle = None
         try:
-            handle = win32file.CreateFile(file_path, win32file.GENERIC_READ,
-                                          win32file.FILE_SHARE_READ & win32file.FILE_SHARE_WRITE,
+            # A share mode of 0 asks for exclusive access: creation fails with a sharing
+            # violation if another handle is open on the file. Certbot's lock files rely
+            # on this on Windows to detect that another instance holds the lock.
+            handle = win32file.CreateFile(file_path, win32file.GENERIC_READ, 0,
                                           attributes, disposition, 0, None)
         except pywintypes.error as err:
             # Handle native windows errors into python errors to be consistent with the API
@@ -268,7 +276,7 @@ def open(file_path: str, flags: int, mode: int = 0o777) -> int:  # pylint: disab
         # At this point, the file that did not exist has been created with proper permissions,
         # so os.O_CREAT and os.O_EXCL are not needed anymore. We remove them from the flags to
         # avoid a FileExists exception before calling os.open.
-        return os.open(file_path, flags ^ os.O_CREAT ^ os.O_EXCL)
+        return os.open(file_path, flags & ~(os.O_CREAT | os.O_EXCL))
 
     # Windows: general case, we call os.open, let exceptions be thrown, then chmod if all is fine.
     fd = os.open(file_path, flags)
@@ -320,12 +328,7 @@ def mkdir(file_path: str, mode: int = 0o777) -> None:
     if POSIX_MODE:
         return os.mkdir(file_path, mode)
 
-    attributes = win32security.SECURITY_ATTRIBUTES()
-    security = attributes.SECURITY_DESCRIPTOR
-    user = _get_current_user()
-    dacl = _generate_dacl(user, mode, _WINDOWS_UMASK.mask)
-    security.SetSecurityDescriptorOwner(user, False)
-    security.SetSecurityDescriptorDacl(1, dacl, 0)
+    attributes = _generate_security_attributes(mode, _WINDOWS_UMASK.mask)
 
     try:
         win32file.CreateDirectory(file_path, attributes)
@@ -346,14 +349,7 @@ def replace(src: str, dst: str) -> None:
     :param str src: The current file path.
     :param str dst: The new file path.
     """
-    if hasattr(os, 'replace'):
-        # Use replace if possible. Since we don't support Python 2 on Windows
-        # and os.replace() was added in Python 3.3, we can assume that
-        # os.replace() is always available on Windows.
-        getattr(os, 'replace')(src, dst)
-    else:
-        # Otherwise, use os.rename() that behaves like os.replace() on Linux.
-        os.rename(src, dst)
+    os.replace(src, dst)
 
 
 def realpath(file_path: str) -> str:
@@ -434,7 +430,7 @@ def has_world_permissions(path: str) -> bool:
     :rtype: bool
     """
     if POSIX_MODE:
-        return bool(stat.S_IMODE(os.stat(path).st_mode) & stat.S_IRWXO)
+        return bool(os.stat(path).st_mode & stat.S_IRWXO)
 
     security = win32security.GetFileSecurity(path, win32security.DACL_SECURITY_INFORMATION)
     dacl = security.GetSecurityDescriptorDacl()
@@ -442,7 +438,7 @@ def has_world_permissions(path: str) -> bool:
     return bool(dacl.GetEffectiveRightsFromAcl({
         'TrusteeForm': win32security.TRUSTEE_IS_SID,
         'TrusteeType': win32security.TRUSTEE_IS_USER,
-        'Identifier': win32security.ConvertStringSidToSid('S-1-1-0'),
+        'Identifier': _EVERYONE_SID,
     }))
 
 
@@ -458,7 +454,7 @@ def compute_private_key_mode(old_key: str, base_mode: int) -> int:
     if POSIX_MODE:
         # On Linux, we keep read/write/execute permissions
         # for group and read permissions for everybody.
-        old_mode = (stat.S_IMODE(os.stat(old_key).st_mode) &
+        old_mode = (os.stat(old_key).st_mode &
                     (stat.S_IRGRP | stat.S_IWGRP | stat.S_IXGRP | stat.S_IROTH))
         return base_mode | old_mode
 
@@ -508,7 +504,7 @@ def has_min_permissions(path: str, min_mode: int) -> bool:
 
     # Resolve symlinks, to get a consistent result with os.stat on Linux,
     # that follows symlinks by default.
-    path = realpath(path)
+    path = _resolve_link(path)
 
     # Get owner sid of the file
     security = win32security.GetFileSecurity(
@@ -559,7 +555,7 @@ def _apply_win_mode(file_path: str, mode: int) -> None:
     file given its path. If the given path is a symbolic link, it will resolved to apply the
     mode on the targeted file.
     """
-    file_path = realpath(file_path)
+    file_path = _resolve_link(file_path)
     # Get owner sid of the file
     security = win32security.GetFileSecurity(file_path, win32security.OWNER_SECURITY_INFORMATION)
     user = security.GetSecurityDescriptorOwner()
@@ -575,57 +571,57 @@ def _apply_win_mode(file_path: str, mode: int) -> None:
 def _generate_dacl(user_sid: Any, mode: int, mask: Optional[int] = None) -> Any:
     if mask:
         mode = mode & (0o777 - mask)
-    analysis = _analyze_mode(mode)
-
-    # Get standard accounts from "well-known" sid
-    # See the list here:
-    # https://support.microsoft.com/en-us/help/243330/well-known-security-identifiers-in-windows-operating-systems
-    system = win32security.ConvertStringSidToSid('S-1-5-18')
-    admins = win32security.ConvertStringSidToSid('S-1-5-32-544')
-    everyone = win32security.ConvertStringSidToSid('S-1-1-0')
 
     # New dacl, without inherited permissions
     dacl = win32security.ACL()
 
     # If user is already system or admins, any ACE defined here would be superseded by
     # the full control ACE that will be added after.
-    if user_sid not in [system, admins]:
+    if user_sid not in [_SYSTEM_SID, _ADMINS_SID]:
         # Handle user rights
-        user_flags = _generate_windows_flags(analysis['user'])
+        user_flags = _generate_windows_flags((mode & stat.S_IRWXU) >> 6)
         if user_flags:
             dacl.AddAccessAllowedAce(win32security.ACL_REVISION, user_flags, user_sid)
 
     # Handle everybody rights
-    everybody_flags = _generate_windows_flags(analysis['all'])
+    everybody_flags = _generate_windows_flags(mode & stat.S_IRWXO)
     if everybody_flags:
-        dacl.AddAccessAllowedAce(win32security.ACL_REVISION, everybody_flags, everyone)
+        dacl.AddAccessAllowedAce(win32security.ACL_REVISION, everybody_flags, _EVERYONE_SID)
 
     # Handle administrator rights
-    full_permissions = _generate_windows_flags({'read': True, 'write': True, 'execute': True})
-    dacl.AddAccessAllowedAce(win32security.ACL_REVISION, full_permissions, system)
-    dacl.AddAccessAllowedAce(win32security.ACL_REVISION, full_permissions, admins)
+    full_permissions = _generate_windows_flags(0o7)
+    dacl.AddAccessAllowedAce(win32security.ACL_REVISION, full_permissions, _SYSTEM_SID)
+    dacl.AddAccessAllowedAce(win32security.ACL_REVISION, full_permissions, _ADMINS_SID)
 
     return dacl
 
 
-def _analyze_mode(mode: int) -> dict[str, dict[str, int]]:
-    return {
-        'user': {
-            'read': mode & stat.S_IRUSR,
-            'write': mode & stat.S_IWUSR,
-            'execute': mode & stat.S_IXUSR,
-        },
-        'all': {
-            'read': mode & stat.S_IROTH,
-            'write': mode & stat.S_IWOTH,
-            'execute': mode & stat.S_IXOTH,
-        },
-    }
+# Certbot creates files and directories with only a handful of modes, so the security
+# attributes built for each (mode, umask) pair are reused. Callers must not modify the
+# returned object.
+@functools.lru_cache(maxsize=16)
+def _generate_security_attributes(mode: int, mask: int) -> Any:
+    attributes = win32security.SECURITY_ATTRIBUTES()
+    security = attributes.SECURITY_DESCRIPTOR
+    user = _get_current_user()
+    dacl = _generate_dacl(user, mode, mask)
+    # We set second parameter to 0 (`False`) to say that this security descriptor is
+    # NOT constructed from a default mechanism, but is explicitly set by the user.
+    # See https://docs.microsoft.com/en-us/windows/desktop/api/securitybaseapi/nf-securitybaseapi-setsecuritydescriptorowner  # pylint: disable=line-too-long
+    security.SetSecurityDescriptorOwner(user, 0)
+    # We set first parameter to 1 (`True`) to say that this security descriptor contains
+    # a DACL. Otherwise second and third parameters are ignored.
+    # We set third parameter to 0 (`False`) to say that this security descriptor is
+    # NOT constructed from a default mechanism, but is explicitly set by the user.
+    # See https://docs.microsoft.com/en-us/windows/desktop/api/securitybaseapi/nf-securitybaseapi-setsecuritydescriptordacl  # pylint: disable=line-too-long
+    security.SetSecurityDescriptorDacl(1, dacl, 0)
+
+    return attributes
 
 
 def _copy_win_ownership(src: str, dst: str) -> None:
     # Resolve symbolic links
-    src = realpath(src)
+    src = _resolve_link(src)
 
     security_src = win32security.GetFileSecurity(src, win32security.OWNER_SECURITY_INFORMATION)
     user_src = security_src.GetSecurityDescriptorOwner()
@@ -640,7 +636,7 @@ def _copy_win_ownership(src: str, dst: str) -> None:
 
 def _copy_win_mode(src: str, dst: str) -> None:
     # Resolve symbolic links
-    src = realpath(src)
+    src = _resolve_link(src)
 
     # Copy the DACL from src to dst.
     security_src = win32security.GetFileSecurity(src, win32security.DACL_SECURITY_INFORMATION)
@@ -651,7 +647,10 @@ def _copy_win_mode(src: str, dst: str) -> None:
     win32security.SetFileSecurity(dst, win32security.DACL_SECURITY_INFORMATION, security_dst)
 
 
-def _generate_windows_flags(rights_desc: dict[str, int]) -> int:
+def _generate_windows_flags(rights: int) -> int:
+    # The rights are given as one POSIX permission triplet (read = 4, write = 2, execute = 1),
+    # as found in the "others" bits of a mode.
+    #
     # Some notes about how each POSIX right is interpreted.
     #
     # For the rights read and execute, we have a pretty bijective relation between
@@ -670,13 +669,13 @@ def _generate_windows_flags(rights_desc: dict[str, int]) -> int:
     # A complete list of the rights defined on NTFS can be found here:
     # https://docs.microsoft.com/en-us/previous-versions/windows/it-pro/windows-server-2003/cc783530(v=ws.10)#permissions-for-files-and-folders
     flag = 0
-    if rights_desc['read']:
+    if rights & stat.S_IROTH:
         flag = flag | ntsecuritycon.FILE_GENERIC_READ
-    if rights_desc['write']:
+    if rights & stat.S_IWOTH:
         flag = flag | (ntsecuritycon.FILE_ALL_ACCESS
                        ^ ntsecuritycon.FILE_GENERIC_READ
                        ^ ntsecuritycon.FILE_GENERIC_EXECUTE)
-    if rights_desc['execute']:
+    if rights & stat.S_IXOTH:
         flag = flag | ntsecuritycon.FILE_GENERIC_EXECUTE
 
     return flag
@@ -684,10 +683,14 @@ def _generate_windows_flags(rights_desc: dict[str, int]) -> int:
 
 def _check_win_mode(file_path: str, mode: int) -> bool:
     # Resolve symbolic links
-    file_path = realpath(file_path)
+    file_path = _resolve_link(file_path)
     # Get current dacl file
     security = win32security.GetFileSecurity(file_path, win32security.OWNER_SECURITY_INFORMATION
                                              | win32security.DACL_SECURITY_INFORMATION)
+    return _check_win_security_mode(security, mode)
+
+
+def _check_win_security_mode(security: Any, mode: int) -> bool:
     dacl = security.GetSecurityDescriptorDacl()
 
     # Get current file owner sid
@@ -704,6 +707,17 @@ def _check_win_mode(file_path: str, mode: int) -> bool:
     return _compare_dacls(dacl, ref_dacl)
 
 
+def _resolve_link(file_path: str) -> str:
+    """
+    Resolve the given path with realpath() only if it is itself a symbolic link. Links in the
+    parent directories are followed by Windows when the file is accessed, so the full
+    resolution, that inspects every path component, is only needed for the last one.
+    """
+    if os.path.islink(file_path):
+        return realpath(file_path)
+    return file_path
+
+
 def _compare_dacls(dacl1: Any, dacl2: Any) -> bool:
     """
     This method compare the two given DACLs to check if they are identical.
@@ -713,6 +727,9 @@ def _compare_dacls(dacl1: Any, dacl2: Any) -> bool:
             [dacl2.GetAce(index) for index in range(dacl2.GetAceCount())])
 
 
+# The account running Certbot does not change during the life of the process, so the
+# domain controller lookups below are only done once.
+@functools.lru_cache(maxsize=1)
 def _get_current_user() -> Any:
     """
     Return the pySID corresponding to the current user.
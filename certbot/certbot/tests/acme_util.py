@@ -3,6 +3,8 @@ from collections.abc import Iterable
 import datetime
 from typing import Any
 
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
 import josepy as jose
 
 from acme import challenges
@@ -10,8 +12,17 @@ from acme import messages
 from certbot._internal import auth_handler
 from certbot.tests import util
 
-JWK = jose.JWK.load(util.load_vector('rsa512_key.pem'))
-KEY = util.load_jose_rsa_private_key_pem('rsa512_key.pem')
+
+def _load_key(name: str) -> jose.ComparableRSAKey:
+    # The vector is trusted, so the costly RSA consistency checks can be skipped
+    key = serialization.load_pem_private_key(
+        util.load_vector(name), password=None, unsafe_skip_rsa_key_validation=True)
+    assert isinstance(key, rsa.RSAPrivateKey)
+    return jose.ComparableRSAKey(key)
+
+
+KEY = _load_key('rsa512_key.pem')
+JWK = jose.JWKRSA(key=KEY)
 
 # Challenges
 HTTP01 = challenges.HTTP01(
@@ -24,16 +35,11 @@ CHALLENGES = [HTTP01, DNS01]
 
 def chall_to_challb(chall: challenges.Challenge, status: messages.Status) -> messages.ChallengeBody:
     """Return ChallengeBody from Challenge."""
-    kwargs = {
-        "chall": chall,
-        "uri": chall.typ + "_uri",
-        "status": status,
-    }
-
+    uri = chall.typ + "_uri"
     if status == messages.STATUS_VALID:
-        kwargs.update({"validated": datetime.datetime.now()})
-
-    return messages.ChallengeBody(**kwargs)
+        return messages.ChallengeBody(chall=chall, uri=uri, status=status,
+                                      validated=datetime.datetime.now())
+    return messages.ChallengeBody(chall=chall, uri=uri, status=status)
 
 
 # Pending ChallengeBody objects
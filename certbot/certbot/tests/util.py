@@ -396,19 +396,25 @@ class ConfigTestCase(TempDirTestCase):
     """Test class which sets up a NamespaceConfig object."""
     def setUp(self) -> None:
         super().setUp()
-        self.config = configuration.NamespaceConfig(
-            # We make a copy here so any mutable values from CLI_DEFAULTS do not get modified.
-            mock.MagicMock(**copy.deepcopy(constants.CLI_DEFAULTS)),
-        )
-        self.config.set_argument_sources({})
-        self.config.namespace.verb = "certonly"
-        self.config.namespace.config_dir = os.path.join(self.tempdir, 'config')
-        self.config.namespace.work_dir = os.path.join(self.tempdir, 'work')
-        self.config.namespace.logs_dir = os.path.join(self.tempdir, 'logs')
-        self.config.namespace.cert_path = constants.CLI_DEFAULTS['auth_cert_path']
-        self.config.namespace.fullchain_path = constants.CLI_DEFAULTS['auth_chain_path']
-        self.config.namespace.chain_path = constants.CLI_DEFAULTS['auth_chain_path']
-        self.config.namespace.server = "https://example.com"
+        self.config = make_config(self.tempdir)
+
+
+def make_config(tempdir: str) -> configuration.NamespaceConfig:
+    """Create a NamespaceConfig using directories in tempdir, as ConfigTestCase does."""
+    config = configuration.NamespaceConfig(
+        # We make a copy here so any mutable values from CLI_DEFAULTS do not get modified.
+        mock.MagicMock(**copy.deepcopy(constants.CLI_DEFAULTS)),
+    )
+    config.set_argument_sources({})
+    config.namespace.verb = "certonly"
+    config.namespace.config_dir = os.path.join(tempdir, 'config')
+    config.namespace.work_dir = os.path.join(tempdir, 'work')
+    config.namespace.logs_dir = os.path.join(tempdir, 'logs')
+    config.namespace.cert_path = constants.CLI_DEFAULTS['auth_cert_path']
+    config.namespace.fullchain_path = constants.CLI_DEFAULTS['auth_chain_path']
+    config.namespace.chain_path = constants.CLI_DEFAULTS['auth_chain_path']
+    config.namespace.server = "https://example.com"
+    return config
 
 
 def _handle_lock(event_in: synchronize.Event, event_out: synchronize.Event, path: str) -> None: